@@ -1,4 +1,13 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from openai import OpenAI
+from config_cache import load_config, load_settings
+from diff_digest import DiffDigest
 
 DEFAULT_PROMPT = """请你作为项目经理的角色，判断变动、更新的内容是否需要人工进行 review，具体规则如下，结果以 JSON 格式返回，字段包括 review_needed、changed_content 和 review_reason。
 1. 若更新内容、变动内容中涉及与安全相关的信息(如 CVE 漏洞、安全漏洞、OpenSSL 等版本升级)，则无条件让人工进行 review。
@@ -10,8 +19,32 @@ DEFAULT_PROMPT = """请你作为项目经理的角色，判断变动、更新的
 """
 # DEFAULT_API_URL = "https://ark.cn-beijing.volces.com/api/v3"
 
+BATCH_PROMPT = """下面有 {count} 个相互独立的变动，用 ==== 变动 N ==== 分隔。请按上述规则逐个判断，
+按顺序返回一个长度为 {count} 的 JSON 数组，每个元素包含 review_needed、changed_content 和 review_reason。
+"""
+
+DEFAULT_AI_SERVICE_SETTINGS = {
+    # 缓存的分析结果数量
+    'cache_size': 1024,
+    # 同时进行的 AI 请求数
+    'max_concurrency': 4,
+    # 每分钟最多发起的 AI 请求数，0 表示不限制
+    'rate_limit_per_minute': 60,
+    # 大于 1 时把多个较小的变动合并为一次请求
+    'batch_size': 1,
+    # 合并请求时最多等待的秒数
+    'batch_window': 2.0,
+    # 参与合并的单个变动最大字符数
+    'batch_max_chars': 4000,
+    # 单个变动发送给 AI 的 token 预算，以及估算 token 数时每个 token 对应的字符数
+    'token_budget': 4000,
+    'chars_per_token': 3.0,
+    # 排序时优先保留包含这些关键字的变化，None 表示使用默认关键字
+    'keywords': None,
+}
+
 class AiClient:
-    def __init__(self, model: str, diff: str, api_token: str, base_url: str | None = None):
+    def __init__(self, model: str, api_token: str, base_url: str | None = None, diff: str | None = None):
         self.client = OpenAI( 
             base_url=base_url,
             api_key=api_token
@@ -19,11 +52,210 @@ class AiClient:
         self.model = model
         self.diff = diff
 
-    def get_response(self):
+    def get_response(self, diff: str | None = None, prompt: str = DEFAULT_PROMPT):
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
-                {"role": "user", "content": [{"type": "text", "text": DEFAULT_PROMPT}, {"type": "text", "text": self.diff}]},
+                {"role": "user", "content": [{"type": "text", "text": prompt}, {"type": "text", "text": diff or self.diff}]},
             ],
         )
-        return response.choices[0].message.content
\ No newline at end of file
+        return response.choices[0].message.content
+
+
+# 只有标记变化、未请求 AI 时的分析结果
+MARKUP_ONLY_RESULT = json.dumps({'skipped': 'markup_only'})
+
+
+def _load_ai_settings():
+    # 每次分析都会调用，文件未修改时使用缓存
+    return load_config('config/ai_settings.json', {})
+
+
+def ai_configured():
+    ai_settings = _load_ai_settings()
+    return bool(ai_settings.get('model') and ai_settings.get('api_token'))
+
+
+def _strip_code_fence(text: str) -> str:
+    match = re.search(r'```(?:json)?\s*(.*?)```', text, re.S)
+    return match.group(1) if match else text
+
+
+class AiService:
+    """进程内共享的 AI 变化分析服务
+
+    复用同一个 AiClient；按变动内容哈希缓存结果，相同的变动（如镜像页面）只请求一次，
+    正在分析的相同变动会等待已有请求的结果；全局限制并发数和每分钟请求数；
+    可选地把多个较小的变动合并为一次请求。
+    """
+
+    def __init__(self, settings: dict | None = None):
+        self.settings = dict(DEFAULT_AI_SERVICE_SETTINGS)
+        self.settings.update(settings or {})
+        self._lock = threading.Lock()
+        self._client = None
+        self._client_key = None
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._semaphore = threading.BoundedSemaphore(int(self.settings['max_concurrency']))
+        self._request_times = []
+        self._batch = []
+        self._batch_timer = None
+        self.digest = DiffDigest(
+            token_budget=int(self.settings['token_budget']),
+            chars_per_token=float(self.settings['chars_per_token']),
+            keywords=self.settings['keywords']
+        )
+        self.cache_hits = 0
+        self.requests = 0
+
+    def _get_client(self):
+        if not ai_configured():
+            raise Exception("AI 设置未配置")
+        ai_settings = _load_ai_settings()
+        key = (ai_settings['model'], ai_settings.get('api_url'), ai_settings['api_token'])
+        with self._lock:
+            if self._client_key != key:
+                self._client = AiClient(
+                    model=ai_settings['model'],
+                    base_url=ai_settings.get('api_url'),
+                    api_token=ai_settings['api_token']
+                )
+                self._client_key = key
+            return self._client
+
+    def _cache_key(self, diff: str) -> str:
+        return hashlib.sha256(diff.encode('utf-8')).hexdigest()
+
+    def analyze(self, diff: str) -> str:
+        """返回 AI 对变动的分析结果（JSON 字符串）
+
+        变动只涉及 HTML 标记时不请求 AI，返回 {"skipped": "markup_only"}，由调用方决定是否通知。
+        """
+        diff = self.digest.prepare(diff)
+        if diff is None:
+            return MARKUP_ONLY_RESULT
+        key = self._cache_key(diff)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._cache[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            if int(self.settings['batch_size']) > 1 and len(diff) <= int(self.settings['batch_max_chars']):
+                self._enqueue_batch(key, diff, future)
+                result = future.result()
+            else:
+                result = self._request(diff)
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return result
+
+    def pending_count(self) -> int:
+        """正在分析或等待合并的变动数"""
+        with self._lock:
+            return len(self._inflight)
+
+    def _store(self, key: str, result: str):
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > int(self.settings['cache_size']):
+                self._cache.popitem(last=False)
+
+    def _wait_rate_limit(self):
+        limit = int(self.settings['rate_limit_per_minute'])
+        if not limit:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._request_times = [t for t in self._request_times if now - t < 60]
+                if len(self._request_times) < limit:
+                    self._request_times.append(now)
+                    return
+                wait = 60 - (now - self._request_times[0])
+            time.sleep(wait)
+
+    def _request(self, diff: str, prompt: str = DEFAULT_PROMPT, cache: bool = True) -> str:
+        client = self._get_client()
+        with self._semaphore:
+            self._wait_rate_limit()
+            self.requests += 1
+            result = client.get_response(diff, prompt=prompt)
+        if cache:
+            self._store(self._cache_key(diff), result)
+        return result
+
+    def _enqueue_batch(self, key: str, diff: str, future: Future):
+        with self._lock:
+            self._batch.append((key, diff, future))
+            if len(self._batch) >= int(self.settings['batch_size']):
+                batch, self._batch = self._batch, []
+                if self._batch_timer:
+                    self._batch_timer.cancel()
+                    self._batch_timer = None
+            else:
+                batch = None
+                if self._batch_timer is None:
+                    self._batch_timer = threading.Timer(float(self.settings['batch_window']), self._flush_batch)
+                    self._batch_timer.daemon = True
+                    self._batch_timer.start()
+        if batch:
+            self._run_batch(batch)
+
+    def _flush_batch(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+            self._batch_timer = None
+        if batch:
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        """合并请求，返回结果无法按条目拆分时退回逐个请求"""
+        results = None
+        if len(batch) > 1:
+            combined = '\n\n'.join(f"==== 变动 {i + 1} ====\n{diff}" for i, (_, diff, _) in enumerate(batch))
+            prompt = DEFAULT_PROMPT + BATCH_PROMPT.format(count=len(batch))
+            try:
+                parsed = json.loads(_strip_code_fence(self._request(combined, prompt=prompt, cache=False)))
+                if isinstance(parsed, list) and len(parsed) == len(batch):
+                    results = [json.dumps(item, ensure_ascii=False) for item in parsed]
+            except Exception as e:
+                print(f"合并的AI分析失败，改为逐个分析: {e}")
+
+        for i, (key, diff, future) in enumerate(batch):
+            try:
+                if results:
+                    self._store(key, results[i])
+                    future.set_result(results[i])
+                else:
+                    future.set_result(self._request(diff))
+            except Exception as e:
+                future.set_exception(e)
+
+
+_ai_service = None
+_ai_service_lock = threading.Lock()
+
+
+def get_ai_service() -> AiService:
+    """返回进程内共享的 AI 分析服务，服务参数读取自 config/ai_service_settings.json"""
+    global _ai_service
+    with _ai_service_lock:
+        if _ai_service is None:
+            _ai_service = AiService(load_settings('config/ai_service_settings.json', DEFAULT_AI_SERVICE_SETTINGS))
+        return _ai_service
\ No newline at end of file
@@ -1,83 +1,350 @@
-from flask import Flask, render_template, request, jsonify
-from monitor import WebsiteMonitor, RSSMonitor, GitHubMonitor
+from flask import Flask, Response, render_template, request, jsonify
+from monitor import MONITOR_TYPES, start_restored
+from ai import get_ai_service
+from cluster import (assign_tasks, load_cluster_settings, load_task_routes, start_local_workers,
+                     stop_local_workers, task_route_key)
+from config_cache import load_config, save_config
 from database import Database
+from events import get_event_bus
+from host_guard import get_host_guard
+from notifier import get_notifier
+from scheduler import get_scheduler
+from task_io import build_monitor, export_csv, export_jsonl, parse_tasks
+import atexit
 import json
+import metrics
+import multiprocessing
 import os
+import queue
+import threading
+import time
+
+# 重启时逾期任务的首次检查在该时间窗口内均匀错开，避免同时发起大量请求
+RESTORE_STAGGER_SECONDS = 60
 
 app = Flask(__name__)
 db = Database()
+# 集群模式下本进程只提供 API 和任务存储，任务由工作进程执行
+cluster_settings = load_cluster_settings()
+# task_id -> 监控实例，实例注册在共享调度器上，不再各自占用线程
+monitors = {}
+
+def restore_monitors():
+    """启动时恢复所有运行中的任务，按持久化的下次检查时间排期，逾期任务错开执行"""
+    restored = []
+    for task in db.get_tasks_by_status('running'):
+        if task['id'] in monitors:
+            continue
+        monitor_class = MONITOR_TYPES.get(task['mode'])
+        if not monitor_class:
+            continue
+        monitor = monitor_class.from_task(task)
+        monitor.db = db
+        monitors[task['id']] = monitor
+        restored.append(monitor)
+
+    start_restored(restored, RESTORE_STAGGER_SECONDS)
+    print(f"已恢复 {len(monitors)} 个监控任务")
+
+# 任务列表每页最多返回的任务数
+MAX_PAGE_SIZE = 200
+# 导入失败时最多返回的错误条数
+MAX_IMPORT_ERRORS = 100
 
 @app.route('/')
 def index():
-    tasks = db.get_all_tasks()
-    return render_template('index.html', tasks=tasks)
+    # 任务列表由页面通过 /api/tasks 分页加载
+    return render_template('index.html')
+
+@app.route('/api/tasks', methods=['GET'])
+def list_tasks():
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('page_size', 50)), 1), MAX_PAGE_SIZE)
+        filters = _task_filters(request.args)
+    except ValueError:
+        return jsonify({'error': '无效的分页参数'}), 400
+
+    tasks, total = db.list_tasks(offset=(page - 1) * page_size, limit=page_size, **filters)
+    return jsonify({'tasks': tasks, 'total': total, 'page': page, 'page_size': page_size})
+
+def _task_filters(args):
+    """从查询参数或请求体中读取任务筛选条件，时间参数无效时抛出 ValueError"""
+    filters = {key: args.get(key) or None for key in ('mode', 'status', 'host')}
+    if any(value is not None and not isinstance(value, str) for value in filters.values()):
+        raise ValueError('mode、status、host 必须是字符串')
+    for key in ('changed_since', 'changed_before'):
+        value = args.get(key)
+        filters[key] = float(value) if value not in (None, '') else None
+    return filters
+
+@app.route('/api/events', methods=['GET'])
+def task_events():
+    """SSE：推送任务的检查结果和状态变化，页面据此就地更新任务行"""
+    if cluster_settings['enabled']:
+        _start_update_poller()
+    event_bus = get_event_bus()
+    subscriber = event_bus.subscribe()
+
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+_update_poller = None
+_update_poller_lock = threading.Lock()
+
+def _start_update_poller():
+    """集群模式下检查在工作进程中执行，由本进程轮询任务库中的最近检查时间再推送"""
+    global _update_poller
+    with _update_poller_lock:
+        if _update_poller is not None:
+            return
+
+        def poll():
+            since = time.time()
+            event_bus = get_event_bus()
+            while True:
+                time.sleep(1)
+                if not event_bus.subscriber_count():
+                    since = time.time()
+                    continue
+                try:
+                    for task in db.get_tasks_checked_since(since):
+                        since = max(since, task['last_checked'])
+                        event_bus.publish(dict(task, type='check'))
+                except Exception as e:
+                    print(f"读取任务状态更新出错: {e}")
+
+        _update_poller = threading.Thread(target=poll, name='task-update-poller', daemon=True)
+        _update_poller.start()
 
 @app.route('/api/tasks', methods=['POST'])
 def add_task():
     data = request.get_json()
-    
-    if data['mode'] == 'website':
-        monitor = WebsiteMonitor(
-            url=data['url'],
-            interval=int(data['interval']),
-            compare_mode=data['compareMode'],
-            send_mail=data['sendMail'],
-            email_addresses=data['emailAddresses'],
-            cc_addresses=data['ccAddresses']
-        )
-    elif data['mode'] == 'github':
-        monitor = GitHubMonitor(
-            url=data['url'],
-            interval=int(data['interval']),
-            compare_mode=data['compareMode'],
-            send_mail=data['sendMail'],
-            email_addresses=data['emailAddresses'],
-            cc_addresses=data['ccAddresses']
-        )
-    elif data['mode'] == 'rss':
-        monitor = RSSMonitor(
-            url=data['url'],
-            interval=int(data['interval']),
-            compare_mode=data['compareMode'],
-            send_mail=data['sendMail'],
-            email_addresses=data['emailAddresses'],
-            cc_addresses=data['ccAddresses']
-        )
-    else:
-        return jsonify({'error': '不支持的监控模式'}), 400
+
+    try:
+        monitor = build_monitor(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     task_id = db.add_task(monitor)
-    
-    monitor.start()
+    if not cluster_settings['enabled']:
+        monitor.task_id = task_id
+        monitor.db = db
+        monitors[task_id] = monitor
+        monitor.start()
+    get_event_bus().publish({'type': 'added', 'id': task_id})
     
     return jsonify({
         'id': task_id,
         'message': '任务添加成功'
     })
 
+@app.route('/api/tasks/import', methods=['POST'])
+def import_tasks():
+    """批量导入任务（JSON lines 或 CSV），在一个事务中写入，首次检查在 stagger 秒内错开
+
+    默认有任何一条记录无效时不导入并返回错误列表；skip_invalid=1 时只导入有效记录。
+    """
+    upload = request.files.get('file')
+    try:
+        # 表格软件导出的 CSV 常带 BOM，上传文件和直接提交的请求体都按 utf-8-sig 解码
+        text = (upload.read() if upload else request.get_data()).decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return jsonify({'error': '导入内容必须是 UTF-8 编码'}), 400
+    filename = upload.filename if upload else ''
+    fmt = request.args.get('format') or (
+        'csv' if filename.endswith('.csv') or 'csv' in (request.content_type or '') else 'jsonl'
+    )
+    try:
+        stagger = max(float(request.args.get('stagger', RESTORE_STAGGER_SECONDS)), 0)
+    except ValueError:
+        return jsonify({'error': '无效的 stagger 参数'}), 400
+
+    entries, errors = parse_tasks(text, fmt)
+    if errors and request.args.get('skip_invalid') not in ('1', 'true'):
+        return jsonify({'error': f'{len(errors)} 条记录无效，未导入任何任务', 'errors': errors[:MAX_IMPORT_ERRORS]}), 400
+    if not entries:
+        return jsonify({'error': '没有可导入的任务', 'errors': errors[:MAX_IMPORT_ERRORS]}), 400
+
+    now = time.time()
+    running = [monitor for _, monitor, status in entries if status == 'running']
+    for i, monitor in enumerate(running):
+        monitor.next_due = now + stagger * i / len(running)
+    task_ids = db.add_tasks([monitor for _, monitor, _ in entries], [status for _, _, status in entries])
+
+    if not cluster_settings['enabled']:
+        for task_id, (_, monitor, _) in zip(task_ids, entries):
+            monitor.task_id = task_id
+            monitor.db = db
+            monitors[task_id] = monitor
+        start_restored(running, stagger)
+    get_event_bus().publish({'type': 'bulk', 'action': 'import', 'count': len(task_ids)})
+
+    return jsonify({
+        'message': f'已导入 {len(task_ids)} 个任务',
+        'imported': len(task_ids),
+        'skipped': len(errors),
+        'errors': errors[:MAX_IMPORT_ERRORS]
+    })
+
+@app.route('/api/tasks/export', methods=['GET'])
+def export_tasks():
+    """按筛选条件导出任务，格式与导入相同"""
+    try:
+        tasks = db.find_tasks(**_task_filters(request.args))
+    except ValueError:
+        return jsonify({'error': '无效的筛选参数'}), 400
+    if request.args.get('format') == 'csv':
+        return Response(export_csv(tasks), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=tasks.csv'})
+    return Response(export_jsonl(tasks), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=tasks.jsonl'})
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+def bulk_tasks():
+    """按筛选条件和/或任务 ID 批量暂停、恢复或删除任务
+
+    请求体：{"action": "pause|resume|delete", "filter": {...}, "ids": [...], "all": false}；
+    没有任何条件时需要显式传入 "all": true。
+    """
+    data = request.get_json() or {}
+    action = data.get('action')
+    if action not in ('pause', 'resume', 'delete'):
+        return jsonify({'error': '不支持的操作'}), 400
+    raw_filter = data.get('filter') or {}
+    if not isinstance(raw_filter, dict):
+        return jsonify({'error': 'filter 必须是对象'}), 400
+    try:
+        filters = _task_filters(raw_filter)
+    except (TypeError, ValueError):
+        return jsonify({'error': '无效的筛选参数'}), 400
+    ids = data.get('ids')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, str) for i in ids)):
+        return jsonify({'error': 'ids 必须是任务 ID 列表'}), 400
+    if ids is None and not any(value is not None for value in filters.values()) and not data.get('all'):
+        return jsonify({'error': '请指定筛选条件、任务 ID，或设置 all 为 true'}), 400
+
+    # 暂停只作用于运行中的任务，恢复只作用于已暂停的任务
+    if action == 'pause':
+        filters['status'] = filters['status'] or 'running'
+    elif action == 'resume':
+        filters['status'] = filters['status'] or 'paused'
+    task_ids = db.find_task_ids(ids=ids, **filters)
+
+    if action == 'delete':
+        for task_id in task_ids:
+            monitor = monitors.pop(task_id, None)
+            if monitor:
+                monitor.pause()
+        db.delete_tasks(task_ids)
+        for task_id in task_ids:
+            metrics.remove_task(task_id)
+    elif action == 'pause':
+        for task_id in task_ids:
+            monitor = monitors.get(task_id)
+            if monitor:
+                monitor.pause()
+        db.update_tasks_status(task_ids, 'paused')
+    else:
+        db.update_tasks_status(task_ids, 'running')
+        if not cluster_settings['enabled']:
+            resumed = []
+            for task in db.find_tasks(ids=task_ids, status='running'):
+                monitor = monitors.get(task['id'])
+                if monitor is None:
+                    monitor_class = MONITOR_TYPES.get(task['mode'])
+                    if not monitor_class:
+                        continue
+                    monitor = monitor_class.from_task(task)
+                    monitor.db = db
+                    monitors[task['id']] = monitor
+                resumed.append(monitor)
+            start_restored(resumed, RESTORE_STAGGER_SECONDS)
+    get_event_bus().publish({'type': 'bulk', 'action': action, 'count': len(task_ids)})
+
+    return jsonify({'message': f'已处理 {len(task_ids)} 个任务', 'count': len(task_ids)})
+
 @app.route('/api/tasks/<task_id>', methods=['DELETE'])
 def delete_task(task_id):
+    monitor = monitors.pop(task_id, None)
+    if monitor:
+        monitor.pause()
     db.delete_task(task_id)
+    metrics.remove_task(task_id)
+    get_event_bus().publish({'type': 'deleted', 'id': task_id})
     return jsonify({'message': '任务删除成功'})
 
 @app.route('/api/tasks/<task_id>/pause', methods=['POST'])
 def pause_task(task_id):
     task = db.get_task(task_id)
     if task:
-        task.pause()
+        monitor = monitors.get(task_id)
+        if monitor:
+            monitor.pause()
+        db.update_task_status(task_id, 'paused')
+        get_event_bus().publish({'type': 'status', 'id': task_id, 'status': 'paused'})
         return jsonify({'message': '任务已暂停'})
     return jsonify({'error': '任务不存在'}), 404
 
+@app.route('/api/tasks/<task_id>/stats', methods=['GET'])
+def task_stats(task_id):
+    monitor = monitors.get(task_id)
+    if monitor:
+        return jsonify(monitor.get_stats())
+    task = db.get_task(task_id) if cluster_settings['enabled'] else None
+    if task:
+        # 任务在工作进程中运行，返回所属进程和最近的检查记录
+        workers = [w['id'] for w in db.get_live_workers(float(cluster_settings['worker_ttl']))]
+        route_key = task.get('route_key') or task_route_key(task)
+        owner = assign_tasks([(task_id, route_key)], workers, int(cluster_settings['virtual_nodes']))[task_id]
+        return jsonify({'worker': owner, 'recent_results': db.get_check_results(task_id, limit=10)})
+    return jsonify({'error': '任务不存在'}), 404
+
+@app.route('/api/workers', methods=['GET'])
+def worker_states():
+    # 存活的工作进程及按一致性哈希分配到的任务数
+    workers = db.get_live_workers(float(cluster_settings['worker_ttl']))
+    assignment = assign_tasks(load_task_routes(db), [w['id'] for w in workers], int(cluster_settings['virtual_nodes']))
+    for worker in workers:
+        worker['assigned'] = sum(1 for owner in assignment.values() if owner == worker['id'])
+    return jsonify({'enabled': cluster_settings['enabled'], 'workers': workers})
+
+@app.route('/api/hosts', methods=['GET'])
+def host_states():
+    # 各主机的熔断状态；集群模式下请求在工作进程中发出，汇总各进程心跳时上报的状态
+    if not cluster_settings['enabled']:
+        return jsonify(get_host_guard().snapshot())
+    hosts = {}
+    for worker in db.get_live_workers(float(cluster_settings['worker_ttl'])):
+        for host, state in worker['hosts'].items():
+            hosts.setdefault(host, {})[worker['id']] = state
+    return jsonify(hosts)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # 队列深度和熔断状态在抓取时读取；集群模式下检查相关的指标由各工作进程的 metrics_address 提供
+    metrics.update_runtime_gauges(get_scheduler(), get_notifier(), get_ai_service(), get_host_guard())
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/settings/ai', methods=['GET', 'POST'])
 def ai_settings():
     if request.method == 'GET':
         try:
-            settings_file = 'config/ai_settings.json'
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                return jsonify({'success': True, 'settings': settings})
-            return jsonify({'success': True, 'settings': {}})
+            settings = load_config('config/ai_settings.json', {})
+            return jsonify({'success': True, 'settings': settings})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
     
@@ -94,10 +361,8 @@ def ai_settings():
             'api_url': data.get('api_url')
         }
         
-        os.makedirs('config', exist_ok=True)
-        
-        with open('config/ai_settings.json', 'w') as f:
-            json.dump(settings, f)
+        # 写入后让配置缓存失效，下一次分析即使用新设置
+        save_config('config/ai_settings.json', settings)
         
         return jsonify({'message': 'AI设置保存成功'})
     except Exception as e:
@@ -107,12 +372,8 @@ def ai_settings():
 def email_settings():
     if request.method == 'GET':
         try:
-            settings_file = 'config/email_settings.json'
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                return jsonify({'success': True, 'settings': settings})
-            return jsonify({'success': True, 'settings': {}})
+            settings = load_config('config/email_settings.json', {})
+            return jsonify({'success': True, 'settings': settings})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)}), 500
             
@@ -148,8 +409,8 @@ def email_settings():
         else:
             return jsonify({'success': False, 'message': '无效的服务类型标识'}), 400
         
-        with open('config/email_settings.json', 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=2, ensure_ascii=False)
+        save_config('config/email_settings.json', settings, indent=2, ensure_ascii=False)
+        get_notifier().reload()
         
         return jsonify({'success': True, 'message': '邮件设置保存成功'})
         
@@ -158,6 +419,8 @@ def email_settings():
         return jsonify({'success': False, 'message': f'保存失败: {str(e)}'}), 500
 
 if __name__ == '__main__':
+    # 打包后的可执行文件启用进程池时需要
+    multiprocessing.freeze_support()
     # import webbrowser
     # import threading
     # import time
@@ -167,6 +430,12 @@ if __name__ == '__main__':
     os.makedirs('config', exist_ok=True)
     
     print("🚀 启动网站变化监控系统...")
+    if cluster_settings['enabled']:
+        workers = start_local_workers(int(cluster_settings['local_workers']))
+        atexit.register(stop_local_workers, workers)
+        print(f"已启动 {len(workers)} 个本地工作进程")
+    else:
+        restore_monitors()
     print("📋 正在启动 Web 服务器...")
     
     # 在单独线程中启动浏览器
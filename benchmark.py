@@ -0,0 +1,672 @@
+"""
+性能基准测试
+使用方法: python benchmark.py --tasks 2000 --duration 60
+
+在子进程中启动本地模拟环境：
+  - 源站：不同大小的静态页面、定期变化的页面、GitHub releases.atom 形式的订阅
+  - 慢速主机和返回错误的主机（使用 127.0.0.2 / 127.0.0.3 回环地址，以便按主机区分）
+  - SMTP 接收端和 OpenAI 兼容的 AI 接口
+然后在临时目录中用独立的 config 运行 N 个监控任务，统计每秒检查数、检查耗时 p50/p99、
+内存占用和每次检查的 CPU 时间，结果保存为 JSON，便于跟踪性能回退。
+
+--workers N 时改为集群模式：任务写入临时任务库，由 N 个本地工作进程按一致性哈希认领执行，
+检查结果从任务库中统计，并核对每个工作进程的心跳、任务分配和 /metrics；
+加 --failover 时在测量中途停止一个工作进程，检查其任务是否由其余进程接管。
+"""
+import argparse
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NORMAL_HOST = '127.0.0.1'
+SLOW_HOST = '127.0.0.2'
+ERROR_HOST = '127.0.0.3'
+
+# 静态页面大小（KB）
+PAGE_SIZES = (1, 10, 100, 1024)
+# 各类任务所占比例
+TASK_MIX = (
+    ('static', 0.5),
+    ('mutating', 0.2),
+    ('feed', 0.2),
+    ('slow', 0.05),
+    ('error', 0.05),
+)
+FEED_ENTRIES = 10
+
+AI_RESULT = json.dumps({
+    'review_needed': True,
+    'changed_content': 'benchmark',
+    'review_reason': 'benchmark'
+})
+
+
+# ---------------------------------------------------------------- 模拟环境
+
+@functools.lru_cache(maxsize=None)
+def _static_page(size_kb, page_id):
+    paragraph = f"<p>Benchmark page {page_id}. " + "Lorem ipsum dolor sit amet. " * 8 + "</p>\n"
+    count = max(1, size_kb * 1024 // len(paragraph))
+    return (f"<html><head><title>page {page_id}</title></head><body>\n"
+            + paragraph * count + "</body></html>\n").encode('utf-8')
+
+
+def _mutating_page(page_id, version):
+    items = ''.join(f"<li>item {page_id}-{n}</li>\n" for n in range(version, version + 20))
+    return (f"<html><head><title>news {page_id}</title></head><body>\n"
+            f"<h1>Version {version}</h1>\n<ul>\n{items}</ul>\n</body></html>\n").encode('utf-8')
+
+
+def _atom_feed(repo_id, version):
+    """与 GitHub releases.atom 结构相同的订阅"""
+    def timestamp(n):
+        return datetime.fromtimestamp(n * 60, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    updated = timestamp(version)
+    entries = []
+    for n in range(version, version - FEED_ENTRIES, -1):
+        entries.append(f"""  <entry>
+    <id>tag:github.com,2008:Repository/{repo_id}/v1.{n}</id>
+    <updated>{timestamp(n)}</updated>
+    <link rel="alternate" type="text/html" href="https://github.com/bench/repo{repo_id}/releases/tag/v1.{n}"/>
+    <title>v1.{n}</title>
+    <content type="html">&lt;p&gt;Release v1.{n}: bug fixes, OpenSSL update for CVE-2024-{n:04d}&lt;/p&gt;</content>
+    <author>
+      <name>bench</name>
+    </author>
+    <media:thumbnail height="30" width="30" url="https://avatars.githubusercontent.com/u/{repo_id}?s=60&amp;v=4"/>
+  </entry>
+""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/" xml:lang="en-US">
+  <id>tag:github.com,2008:https://github.com/bench/repo{repo_id}/releases</id>
+  <link type="text/html" rel="alternate" href="https://github.com/bench/repo{repo_id}/releases"/>
+  <link type="application/atom+xml" rel="self" href="https://github.com/bench/repo{repo_id}/releases.atom"/>
+  <title>Release notes from repo{repo_id}</title>
+  <updated>{updated}</updated>
+{''.join(entries)}</feed>
+""".encode('utf-8')
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        options = self.server.options
+        parts = self.path.strip('/').split('/')
+        kind = parts[0]
+        version = int(time.time() // options['mutate_period'])
+        etag = True
+
+        if kind == 'static':
+            body = _static_page(int(parts[1]), parts[2])
+            # 一半的静态页面不返回 ETag，走哈希快速路径
+            etag = int(parts[2]) % 2 == 0
+        elif kind == 'mutating':
+            body = _mutating_page(parts[1], version + int(parts[1]) % 7)
+        elif kind == 'feed':
+            body = _atom_feed(parts[1], version + 100)
+        elif kind == 'slow':
+            time.sleep(options['slow_delay'])
+            body = _static_page(10, parts[1])
+        elif kind == 'error':
+            self.send_response(random.choice((500, 502, 503)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        tag = '"' + hashlib.md5(body).hexdigest() + '"' if etag else None
+        if tag and self.headers.get('If-None-Match') == tag:
+            self.send_response(304)
+            self.send_header('ETag', tag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/atom+xml' if kind == 'feed' else 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if tag:
+            self.send_header('ETag', tag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class AiStubHandler(BaseHTTPRequestHandler):
+    """OpenAI 兼容的 /v1/chat/completions"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        time.sleep(self.server.options['ai_latency'])
+        with self.server.counters['ai_requests'].get_lock():
+            self.server.counters['ai_requests'].value += 1
+        body = json.dumps({
+            'id': 'chatcmpl-bench',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'bench',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': AI_RESULT},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """只接收不投递的 SMTP 服务器，不支持 STARTTLS"""
+
+    def _reply(self, line):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        try:
+            self._handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # 客户端（如测量中途停止的工作进程）断开连接
+            pass
+
+    def _handle(self):
+        self._reply('220 bench SMTP sink')
+        in_data = False
+        for raw in self.rfile:
+            line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+            if in_data:
+                if line == '.':
+                    in_data = False
+                    with self.server.counters['emails'].get_lock():
+                        self.server.counters['emails'].value += 1
+                    self._reply('250 OK')
+                continue
+            command = line.split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self._reply('250-bench')
+                self._reply('250 AUTH PLAIN LOGIN')
+            elif command == 'AUTH':
+                self._reply('235 Authentication successful')
+            elif command == 'DATA':
+                in_data = True
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('250 OK')
+
+
+class ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class HttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _serve(server_class, address, handler, options, counters):
+    server = server_class(address, handler)
+    server.options = options
+    server.counters = counters
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run_farm(options, counters, hosts, ready):
+    """子进程入口：启动所有模拟服务后一直运行，由父进程结束"""
+    port = options['port']
+    for host in set(hosts.values()):
+        _serve(HttpServer, (host, port), OriginHandler, options, counters)
+    _serve(HttpServer, (NORMAL_HOST, options['ai_port']), AiStubHandler, options, counters)
+    _serve(ThreadingTCPServer, (NORMAL_HOST, options['smtp_port']), SmtpSinkHandler, options, counters)
+    ready.set()
+    while True:
+        time.sleep(3600)
+
+
+def _loopback_hosts():
+    """检查 127.0.0.2/127.0.0.3 是否可用（Linux 可用，macOS 等需要手动添加别名）"""
+    import socket
+    hosts = {'normal': NORMAL_HOST, 'slow': SLOW_HOST, 'error': ERROR_HOST}
+    for kind, host in list(hosts.items()):
+        try:
+            with socket.socket() as s:
+                s.bind((host, 0))
+        except OSError:
+            print(f"⚠️ 无法使用 {host}，{kind} 主机改用 {NORMAL_HOST}，熔断器会影响同主机的其他任务")
+            hosts[kind] = NORMAL_HOST
+    return hosts
+
+
+# ---------------------------------------------------------------- 运行任务
+
+def _write_config(workdir, args):
+    config_dir = os.path.join(workdir, 'config')
+    os.makedirs(config_dir)
+    configs = {
+        'email_settings.json': {
+            'service_type': 'smtp',
+            'smtp_server': NORMAL_HOST,
+            'smtp_port': args.smtp_port,
+            'smtp_starttls': False,
+            'email_account': 'bench@example.com',
+            'email_password': 'bench'
+        },
+        'ai_settings.json': {
+            'model': 'bench',
+            'api_token': 'bench',
+            'api_url': f'http://{NORMAL_HOST}:{args.ai_port}/v1'
+        },
+        # 基准测试衡量的是程序本身的吞吐，关闭对外的限速
+        'host_settings.json': {'rate_per_second': 0},
+        'ai_service_settings.json': {'rate_limit_per_minute': 0},
+        'scheduler_settings.json': {'max_concurrency': args.concurrency},
+        'http_settings.json': {'pool_maxsize': args.concurrency},
+        'processing_settings.json': {'process_pool': args.process_pool},
+        # 集群模式从检查记录中统计结果，测量期间不清理
+        'database_settings.json': {'results_keep_last': None, 'results_keep_days': None},
+        'cluster_settings.json': {
+            'enabled': bool(args.workers),
+            'heartbeat_interval': 1,
+            'worker_ttl': 4,
+            'restore_stagger': args.warmup,
+            'metrics_port': args.metrics_port,
+        },
+    }
+    for name, settings in configs.items():
+        with open(os.path.join(config_dir, name), 'w', encoding='utf-8') as f:
+            json.dump(settings, f, indent=2)
+
+
+def _timed_class(cls, latencies, lock):
+    class TimedMonitor(cls):
+        def run_check(self):
+            started = time.perf_counter()
+            super().run_check()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+    TimedMonitor.__name__ = f"Timed{cls.__name__}"
+    return TimedMonitor
+
+
+def _build_monitors(args, hosts, website, github):
+    rng = random.Random(args.seed)
+    base = {
+        'normal': f"http://{hosts['normal']}:{args.port}",
+        'slow': f"http://{hosts['slow']}:{args.port}",
+        'error': f"http://{hosts['error']}:{args.port}",
+    }
+    kinds = [kind for kind, _ in TASK_MIX]
+    weights = [weight for _, weight in TASK_MIX]
+    mail = {'send_mail': True, 'email_addresses': ['bench@example.com']}
+
+    monitors = []
+    counts = dict.fromkeys(kinds, 0)
+    for i in range(args.tasks):
+        kind = rng.choices(kinds, weights)[0]
+        counts[kind] += 1
+        if kind == 'static':
+            size = PAGE_SIZES[i % len(PAGE_SIZES)]
+            monitor = website(f"{base['normal']}/static/{size}/{i}", args.interval, compare_mode=True)
+        elif kind == 'mutating':
+            monitor = website(f"{base['normal']}/mutating/{i}", args.interval, compare_mode=True, **mail)
+        elif kind == 'feed':
+            monitor = github(f"{base['normal']}/feed/{i}", args.interval, compare_mode=True, **mail)
+        elif kind == 'slow':
+            monitor = website(f"{base['slow']}/slow/{i}", args.interval, compare_mode=True)
+        else:
+            monitor = website(f"{base['error']}/error/{i}", args.interval, compare_mode=True)
+        monitors.append(monitor)
+    return monitors, counts
+
+
+def _rss_bytes():
+    """当前常驻内存；无法读取 /proc 时退回峰值"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return _peak_rss_bytes()
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上单位是字节，Linux 上是 KB
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _process_cpu_seconds(pid):
+    """读取 /proc 中子进程已用的 CPU 时间，无法读取时返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_metrics_ok(address):
+    import urllib.request
+    try:
+        with urllib.request.urlopen(f'http://{address}/metrics', timeout=5) as response:
+            return 'webmonitor_checks_total' in response.read().decode('utf-8')
+    except OSError:
+        return False
+
+
+def _run_cluster(args, hosts, counters):
+    """集群模式：由本地工作进程执行任务，检查结果从任务库中统计，返回 (任务类型统计, 测量结果)"""
+    from cluster import start_local_workers, stop_local_workers
+    from database import Database
+    from monitor import GitHubMonitor, WebsiteMonitor
+
+    db = Database()
+    monitors, counts = _build_monitors(args, hosts, WebsiteMonitor, GitHubMonitor)
+    db.add_tasks(monitors)
+    print(f"📋 写入 {len(monitors)} 个任务，启动 {args.workers} 个工作进程: {counts}")
+    processes = start_local_workers(args.workers)
+    try:
+        time.sleep(args.warmup)
+        emails_before = counters['emails'].value
+        ai_before = counters['ai_requests'].value
+        cpu_before = {p.pid: _process_cpu_seconds(p.pid) for p in processes}
+        started_at = time.time()
+        started = time.perf_counter()
+        print(f"⏱️ 预热 {args.warmup} 秒完成，开始测量 {args.duration} 秒...")
+
+        stopped = None
+        if args.failover and len(processes) > 1:
+            time.sleep(args.duration / 2)
+            stopped = processes[-1]
+            cpu_before.pop(stopped.pid, None)
+            stop_local_workers([stopped])
+            print(f"🔌 已停止工作进程 {stopped.name}，等待其余进程接管")
+            time.sleep(args.duration / 2)
+        else:
+            time.sleep(args.duration)
+
+        elapsed = time.perf_counter() - started
+        cpu_values = [
+            _process_cpu_seconds(pid) - before
+            for pid, before in cpu_before.items()
+            if before is not None and _process_cpu_seconds(pid) is not None
+        ]
+        cpu = sum(cpu_values) if cpu_values else None
+
+        conn = db._connect()
+        rows = conn.execute(
+            'SELECT task_id, result, duration FROM check_results WHERE checked_at >= ?', (started_at,)
+        ).fetchall()
+        # 最后一个心跳间隔内各进程应已完成重新分配
+        workers = db.get_live_workers(4)
+        checked_tasks = {row['task_id'] for row in rows}
+        cluster = {
+            'workers': [
+                {
+                    'id': w['id'],
+                    'task_count': w['task_count'],
+                    'metrics_address': w['metrics_address'],
+                    'metrics_ok': bool(w['metrics_address']) and _worker_metrics_ok(w['metrics_address']),
+                }
+                for w in workers
+            ],
+            'stopped_worker': stopped.name if stopped else None,
+            'assigned_tasks': sum(w['task_count'] for w in workers),
+            'unchecked_tasks': len(monitors) - len(checked_tasks),
+        }
+    finally:
+        stop_local_workers(processes)
+
+    by_result = {}
+    for row in rows:
+        by_result[row['result']] = by_result.get(row['result'], 0) + 1
+    measured = [row['duration'] for row in rows if row['duration'] is not None]
+    checks = len(rows)
+    return counts, {
+        'checks': checks,
+        'checks_per_second': checks / elapsed if elapsed else 0,
+        'latency_p50': _percentile(measured, 0.5),
+        'latency_p99': _percentile(measured, 0.99),
+        'latency_max': max(measured) if measured else None,
+        'cpu_seconds': cpu,
+        'cpu_per_check': cpu / checks if checks and cpu is not None else None,
+        'rss_bytes': None,
+        'checks_by_result': by_result,
+        'ai_requests': counters['ai_requests'].value - ai_before,
+        'emails_received': counters['emails'].value - emails_before,
+        'cluster': cluster,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=PROJECT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(args):
+    hosts = _loopback_hosts()
+    counters = {
+        'emails': multiprocessing.Value('i', 0),
+        'ai_requests': multiprocessing.Value('i', 0),
+    }
+    ready = multiprocessing.Event()
+    farm_options = {
+        'port': args.port,
+        'ai_port': args.ai_port,
+        'smtp_port': args.smtp_port,
+        'mutate_period': args.mutate_period,
+        'slow_delay': args.slow_delay,
+        'ai_latency': args.ai_latency,
+    }
+    farm = multiprocessing.Process(target=run_farm, args=(farm_options, counters, hosts, ready), daemon=True)
+    farm.start()
+    if not ready.wait(10):
+        farm.terminate()
+        raise RuntimeError("模拟服务启动失败")
+
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='webmonitor-bench-')
+    _write_config(workdir, args)
+    os.chdir(workdir)
+    sys.path.insert(0, PROJECT_DIR)
+    try:
+        if args.workers:
+            counts, results = _run_cluster(args, hosts, counters)
+        else:
+            counts, results = _run_local(args, hosts, counters)
+        result = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'tasks': args.tasks,
+                'interval_minutes': args.interval,
+                'duration': args.duration,
+                'warmup': args.warmup,
+                'concurrency': args.concurrency,
+                'process_pool': args.process_pool,
+                'workers': args.workers,
+                'failover': args.failover,
+                'mutate_period': args.mutate_period,
+                'slow_delay': args.slow_delay,
+                'ai_latency': args.ai_latency,
+                'seed': args.seed,
+                'task_mix': counts,
+            },
+            'results': results,
+        }
+    finally:
+        os.chdir(original_dir)
+        farm.terminate()
+        if args.keep:
+            print(f"📁 临时目录保留在 {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    output_file = os.path.join(args.output, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    r = result['results']
+    print(f"\n✅ 每秒检查数: {r['checks_per_second']:.1f}  （共 {r['checks']} 次）")
+    if r['checks']:
+        print(f"   检查耗时 p50: {r['latency_p50'] * 1000:.1f} ms  p99: {r['latency_p99'] * 1000:.1f} ms")
+        if r['cpu_per_check'] is not None:
+            print(f"   每次检查 CPU: {r['cpu_per_check'] * 1000:.2f} ms")
+    if r['rss_bytes']:
+        print(f"   内存: {r['rss_bytes'] / 1024 / 1024:.1f} MB")
+    if 'cluster' in r:
+        c = r['cluster']
+        for w in c['workers']:
+            print(f"   工作进程 {w['id']}: {w['task_count']} 个任务，指标{'正常' if w['metrics_ok'] else '不可用'}")
+        print(f"   已分配 {c['assigned_tasks']} / {args.tasks} 个任务，测量期间未检查 {c['unchecked_tasks']} 个")
+    print(f"   结果已保存到 {output_file}")
+    return result
+
+
+def _run_local(args, hosts, counters):
+    """在当前进程中运行任务，返回 (任务类型统计, 测量结果)"""
+    from monitor import GitHubMonitor, WebsiteMonitor
+    from notifier import get_notifier
+    from scheduler import get_scheduler
+
+    latencies = []
+    lock = threading.Lock()
+    monitors, counts = _build_monitors(
+        args, hosts, _timed_class(WebsiteMonitor, latencies, lock), _timed_class(GitHubMonitor, latencies, lock)
+    )
+    rss_before = _rss_bytes()
+    print(f"📋 启动 {len(monitors)} 个监控任务: {counts}")
+    period = args.interval * 60
+    for monitor in monitors:
+        monitor.start(delay=random.uniform(0, min(period, args.warmup or period)))
+
+    time.sleep(args.warmup)
+    with lock:
+        latencies.clear()
+    emails_before = counters['emails'].value
+    ai_before = counters['ai_requests'].value
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    print(f"⏱️ 预热 {args.warmup} 秒完成，开始测量 {args.duration} 秒...")
+
+    time.sleep(args.duration)
+
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_before
+    with lock:
+        measured = list(latencies)
+    rss_after = _rss_bytes()
+    for monitor in monitors:
+        monitor.pause()
+    get_scheduler().stop()
+    # 在离开并删除临时目录之前停止通知队列，避免结果输出后仍在重试发送
+    notifications_pending = get_notifier().pending_count()
+    get_notifier().stop()
+
+    checks = len(measured)
+    return counts, {
+        'checks': checks,
+        'checks_per_second': checks / elapsed if elapsed else 0,
+        'latency_p50': _percentile(measured, 0.5),
+        'latency_p99': _percentile(measured, 0.99),
+        'latency_max': max(measured) if measured else None,
+        'cpu_seconds': cpu,
+        'cpu_per_check': cpu / checks if checks else None,
+        'rss_bytes': rss_after,
+        'rss_growth_bytes': rss_after - rss_before if rss_after and rss_before else None,
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'not_modified': sum(m.not_modified_count for m in monitors),
+        'hash_skipped': sum(m.hash_skip_count for m in monitors),
+        'circuit_skipped': sum(m.circuit_skip_count for m in monitors),
+        'ai_requests': counters['ai_requests'].value - ai_before,
+        'emails_received': counters['emails'].value - emails_before,
+        'notifications_pending': notifications_pending,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='网站变化监控系统性能基准测试')
+    parser.add_argument('--tasks', type=int, default=1000, help='监控任务数')
+    parser.add_argument('--interval', type=float, default=0.25, help='检查间隔（分钟）')
+    parser.add_argument('--duration', type=float, default=60, help='测量时长（秒）')
+    parser.add_argument('--warmup', type=float, default=15, help='预热时长（秒），首次检查在此期间错开')
+    parser.add_argument('--concurrency', type=int, default=32, help='调度器并发检查数')
+    parser.add_argument('--process-pool', action='store_true', help='解析和对比放到进程池中执行')
+    parser.add_argument('--mutate-period', type=float, default=30, help='变化页面和订阅的更新周期（秒）')
+    parser.add_argument('--slow-delay', type=float, default=2.0, help='慢速主机的响应延迟（秒）')
+    parser.add_argument('--ai-latency', type=float, default=0.2, help='模拟 AI 接口的响应延迟（秒）')
+    parser.add_argument('--port', type=int, default=18080, help='模拟源站端口')
+    parser.add_argument('--ai-port', type=int, default=18081, help='模拟 AI 接口端口')
+    parser.add_argument('--smtp-port', type=int, default=18025, help='SMTP 接收端端口')
+    parser.add_argument('--seed', type=int, default=1, help='任务类型分配的随机种子')
+    parser.add_argument('--output', default='benchmark_results', help='结果 JSON 保存目录')
+    parser.add_argument('--keep', action='store_true', help='保留运行时的临时目录（快照、配置）')
+    parser.add_argument('--workers', type=int, default=0, help='集群模式下的本地工作进程数，0 表示在当前进程中运行')
+    parser.add_argument('--failover', action='store_true', help='集群模式下在测量中途停止一个工作进程')
+    parser.add_argument('--metrics-port', type=int, default=19200, help='集群模式下第一个工作进程的 /metrics 端口')
+    run_benchmark(parser.parse_args())
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,252 @@
+import bisect
+import hashlib
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ai import get_ai_service
+from config_cache import load_settings
+from database import Database
+from host_guard import get_host_guard
+from monitor import MONITOR_TYPES, start_restored
+from notifier import get_notifier
+from scheduler import get_scheduler
+import metrics
+
+DEFAULT_CLUSTER_SETTINGS = {
+    # 启用后 app.py 只提供 API 和任务存储，监控任务由工作进程执行
+    'enabled': False,
+    # app.py 启动时在本机创建的工作进程数，0 表示只使用单独启动的 worker.py
+    'local_workers': 2,
+    # 心跳和同步任务分配的间隔（秒）
+    'heartbeat_interval': 5,
+    # 超过该秒数没有心跳的工作进程视为已退出，其任务由其他进程接管
+    'worker_ttl': 20,
+    # 一致性哈希环上每个工作进程的虚拟节点数
+    'virtual_nodes': 64,
+    # 接管的任务中已逾期的部分在该秒数内错开执行
+    'restore_stagger': 60,
+    # 每个工作进程在 metrics_host:端口 上提供 /metrics，本机工作进程依次使用 metrics_port、metrics_port+1 ...；
+    # 0 表示不提供。检查耗时、抓取和主机错误等指标只存在于执行检查的工作进程中
+    'metrics_host': '127.0.0.1',
+    'metrics_port': 9200,
+}
+
+
+def load_cluster_settings():
+    return load_settings('config/cluster_settings.json', DEFAULT_CLUSTER_SETTINGS)
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """一致性哈希环：工作进程加入或退出时只有约 1/N 的任务改变归属"""
+
+    def __init__(self, nodes, virtual_nodes=64):
+        self._ring = sorted(
+            (_hash(f"{node}#{i}"), node) for node in nodes for i in range(virtual_nodes)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    def owner(self, key):
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def task_route_key(task):
+    """任务在哈希环上的键：共享检查的任务使用相同的键，分配到同一个工作进程"""
+    monitor_class = MONITOR_TYPES.get(task['mode'])
+    return monitor_class.task_share_key(task) if monitor_class else task['id']
+
+
+def load_task_routes(db):
+    """返回运行中任务的 [(任务 ID, 哈希环上的键)]；旧记录没有 route_key 时按完整任务计算并写回"""
+    routes = []
+    for task_id, route_key in db.get_task_routes('running'):
+        if route_key is None:
+            task = db.get_task(task_id)
+            if task is None:
+                continue
+            route_key = task_route_key(task)
+            db.update_task(task_id, route_key=route_key)
+        routes.append((task_id, route_key))
+    return routes
+
+
+def assign_tasks(routes, worker_ids, virtual_nodes=64):
+    """按 [(任务 ID, 哈希环上的键)] 返回 task_id -> worker_id 的分配结果"""
+    ring = HashRing(worker_ids, virtual_nodes)
+    return {task_id: ring.owner(route_key) for task_id, route_key in routes}
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """工作进程的 /metrics"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        metrics.update_runtime_gauges(get_scheduler(), get_notifier(), get_ai_service(), get_host_guard())
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Worker:
+    """执行监控任务的工作进程
+
+    定期在任务库中登记心跳，用所有存活工作进程构建一致性哈希环，按任务的共享键（task_route_key）
+    认领属于自己的运行中任务，同组共享检查的任务总是分配到同一个进程；工作进程加入或退出（心跳超时）后，下一次同步时各进程自动接管或释放任务。
+    任务状态（ETag、哈希、下次检查时间等）都保存在任务库中，接管的进程从上次的进度继续。
+    交接期间（最多一个心跳间隔）同一任务可能被新旧两个进程各检查一次。
+
+    主机限速和熔断在每个进程中独立计算：同一主机的任务分布在 N 个工作进程中时，
+    该主机实际承受的请求速率上限为 rate_per_second 的 N 倍。
+    """
+
+    def __init__(self, worker_id=None, db=None, settings=None, metrics_port=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.db = db or Database()
+        self.settings = dict(DEFAULT_CLUSTER_SETTINGS)
+        self.settings.update(settings or {})
+        self.metrics_port = int(self.settings['metrics_port'] if metrics_port is None else metrics_port)
+        self.metrics_address = None
+        self._metrics_server = None
+        self.monitors = {}
+        self._stop = threading.Event()
+
+    def _heartbeat(self):
+        self.db.heartbeat_worker(
+            self.worker_id, socket.gethostname(), os.getpid(), len(self.monitors),
+            metrics_address=self.metrics_address, hosts=get_host_guard().snapshot()
+        )
+
+    def _start_metrics_server(self):
+        if not self.metrics_port:
+            return
+        try:
+            server = ThreadingHTTPServer((self.settings['metrics_host'], self.metrics_port), MetricsHandler)
+        except OSError as e:
+            print(f"[{self.worker_id}] 无法在端口 {self.metrics_port} 提供指标: {e}")
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='worker-metrics', daemon=True).start()
+        self._metrics_server = server
+        self.metrics_address = f"{self.settings['metrics_host']}:{self.metrics_port}"
+        print(f"[{self.worker_id}] 指标地址 http://{self.metrics_address}/metrics")
+
+    def sync(self):
+        """登记心跳并按当前的哈希环启动或停止任务"""
+        self._heartbeat()
+        workers = [w['id'] for w in self.db.get_live_workers(float(self.settings['worker_ttl']))]
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+        ring = HashRing(workers, int(self.settings['virtual_nodes']))
+
+        # 每次心跳只读取任务 ID 和路由键，完整的任务记录只在认领时读取
+        owned = {
+            task_id for task_id, route_key in load_task_routes(self.db)
+            if ring.owner(route_key) == self.worker_id
+        }
+
+        released = [task_id for task_id in self.monitors if task_id not in owned]
+        for task_id in released:
+            self.monitors.pop(task_id).pause()
+            metrics.remove_task(task_id)
+
+        claimed = []
+        new_ids = [task_id for task_id in owned if task_id not in self.monitors]
+        for task in (self.db.find_tasks(ids=new_ids, status='running') if new_ids else []):
+            task_id = task['id']
+            monitor_class = MONITOR_TYPES.get(task['mode'])
+            if not monitor_class:
+                continue
+            try:
+                monitor = monitor_class.from_task(task)
+            except ValueError as e:
+                print(f"[{self.worker_id}] 任务 {task_id} 配置无效: {e}")
+                continue
+            monitor.db = self.db
+            self.monitors[task_id] = monitor
+            claimed.append(monitor)
+        start_restored(claimed, float(self.settings['restore_stagger']))
+
+        if claimed or released:
+            print(f"[{self.worker_id}] 工作进程 {len(workers)} 个，认领 {len(claimed)} 个任务，"
+                  f"释放 {len(released)} 个，当前 {len(self.monitors)} 个")
+
+    def run(self):
+        print(f"[{self.worker_id}] 工作进程启动")
+        interval = float(self.settings['heartbeat_interval'])
+        self._start_metrics_server()
+        try:
+            # 先登记并等待一个心跳间隔，让同时启动的进程互相可见，避免第一个进程认领全部任务
+            self._heartbeat()
+            self._stop.wait(interval)
+            while not self._stop.is_set():
+                try:
+                    self.sync()
+                except Exception as e:
+                    print(f"[{self.worker_id}] 同步任务出错: {e}")
+                self._stop.wait(interval)
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        self._stop.set()
+
+    def shutdown(self):
+        """停止所有任务并注销，其他进程在下一次同步时立即接管"""
+        for monitor in self.monitors.values():
+            monitor.pause()
+        self.monitors.clear()
+        if self._metrics_server:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+        try:
+            self.db.remove_worker(self.worker_id)
+        except Exception as e:
+            print(f"[{self.worker_id}] 注销工作进程出错: {e}")
+        print(f"[{self.worker_id}] 工作进程已退出")
+
+
+def run_worker(worker_id=None, metrics_port=None):
+    """工作进程入口，收到 SIGTERM/SIGINT 时注销后退出"""
+    worker = Worker(worker_id, settings=load_cluster_settings(), metrics_port=metrics_port)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *args: worker.stop())
+    worker.run()
+
+
+def start_local_workers(count):
+    """在本机启动 count 个工作进程，返回进程列表"""
+    settings = load_cluster_settings()
+    base_port = int(settings['metrics_port'])
+    processes = []
+    for i in range(count):
+        worker_id = f"{socket.gethostname()}-local-{i}"
+        metrics_port = base_port + i if base_port else 0
+        process = multiprocessing.Process(target=run_worker, args=(worker_id, metrics_port), name=worker_id)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_local_workers(processes, timeout=10):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
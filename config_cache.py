@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+
+class ConfigCache:
+    """按文件修改时间缓存解析后的 JSON 配置
+
+    文件的 mtime 和大小不变时直接返回上次解析的结果，否则重新读取。
+    返回的对象在调用方之间共享，不能修改。
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, path, default=None):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return default
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry[0] == stamp:
+            return entry[1]
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self._lock:
+            self._entries[path] = (stamp, data)
+        return data
+
+    def save(self, path, data, **dump_kwargs):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        self.invalidate(path)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+_config_cache = ConfigCache()
+
+
+def load_config(path, default=None):
+    """读取 JSON 配置，文件未修改时使用缓存；文件不存在时返回 default"""
+    return _config_cache.load(path, default)
+
+
+def load_settings(path, defaults):
+    """读取模块设置：在 defaults 的副本上合并 JSON 文件中的值；文件不存在时返回默认值"""
+    settings = dict(defaults)
+    settings.update(load_config(path, {}))
+    return settings
+
+
+def save_config(path, data, **dump_kwargs):
+    """写入 JSON 配置并让缓存失效"""
+    _config_cache.save(path, data, **dump_kwargs)
+
+
+def invalidate_config(path=None):
+    _config_cache.invalidate(path)
@@ -1,27 +1,228 @@
 import json
 import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
 from uuid import uuid4
+from config_cache import load_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    interval REAL NOT NULL,
+    compare_mode INTEGER NOT NULL DEFAULT 0,
+    send_mail INTEGER NOT NULL DEFAULT 0,
+    email_addresses TEXT NOT NULL DEFAULT '[]',
+    cc_addresses TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'running',
+    etag TEXT,
+    last_modified TEXT,
+    next_due REAL,
+    created_at REAL NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}',
+    host TEXT,
+    last_checked REAL,
+    last_result TEXT,
+    last_changed REAL,
+    route_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_mode ON tasks(mode);
+CREATE INDEX IF NOT EXISTS idx_tasks_next_due ON tasks(next_due);
+
+CREATE TABLE IF NOT EXISTS check_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    result TEXT NOT NULL,
+    duration REAL,
+    content_hash TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_check_results_task ON check_results(task_id, checked_at);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    recipients TEXT NOT NULL,
+    success INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_task ON notifications(task_id, sent_at);
+
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    task_count INTEGER NOT NULL DEFAULT 0,
+    metrics_address TEXT,
+    hosts TEXT
+);
+"""
+
+DEFAULT_DATABASE_SETTINGS = {
+    # 每个任务最多保留的检查记录数，None 表示不限制
+    'results_keep_last': 200,
+    # 检查记录最长保留天数，None 表示不限制
+    'results_keep_days': 30,
+}
+
+# 以 JSON 文本保存的列
+JSON_COLUMNS = ('email_addresses', 'cc_addresses')
+BOOL_COLUMNS = ('compare_mode', 'send_mail')
+TASK_COLUMNS = (
+    'id', 'url', 'mode', 'interval', 'compare_mode', 'send_mail', 'email_addresses',
+    'cc_addresses', 'status', 'etag', 'last_modified', 'next_due', 'created_at',
+    'host', 'last_checked', 'last_result', 'last_changed', 'route_key'
+)
+# 旧版数据库中缺少、启动时补上的列
+ADDED_COLUMNS = {
+    'host': 'TEXT',
+    'last_checked': 'REAL',
+    'last_result': 'TEXT',
+    'last_changed': 'REAL',
+    # 集群模式在哈希环上使用的键（共享键），写入任务时计算
+    'route_key': 'TEXT',
+}
+# 旧版数据库 workers 表中缺少的列
+ADDED_WORKER_COLUMNS = {
+    'metrics_address': 'TEXT',
+    'hosts': 'TEXT',
+}
+# 任务列表接口使用的索引，依赖 ADDED_COLUMNS 中的列，迁移后再创建
+LIST_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_mode_created ON tasks(mode, created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_host_created ON tasks(host, created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_created ON tasks(created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_last_changed ON tasks(last_changed);
+CREATE INDEX IF NOT EXISTS idx_tasks_last_checked ON tasks(last_checked);
+"""
+# 任务列表返回的列，不读取可能很大的 extra
+LIST_COLUMNS = (
+    'id', 'url', 'mode', 'interval', 'status', 'host', 'next_due', 'created_at',
+    'last_checked', 'last_result', 'last_changed'
+)
+
 
 class Database:
-    def __init__(self):
-        self.tasks = {}
-        self.db_file = 'config/tasks.json'
-        self._load_tasks()
+    """基于 SQLite (WAL 模式) 的任务存储
+
+    每个线程使用独立连接；首次启动时若存在旧的 config/tasks.json 会一次性导入。
+    不属于固定列的任务字段保存在 extra 列中，读取时合并回任务字典。
+    检查记录按 config/database_settings.json 中的保留策略在写入时清理。
+    """
+
+    def __init__(self, db_file='config/tasks.db', legacy_file='config/tasks.json', settings=None):
+        self.db_file = db_file
+        self.legacy_file = legacy_file
+        self.settings = load_settings('config/database_settings.json', DEFAULT_DATABASE_SETTINGS)
+        self.settings.update(settings or {})
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        self._connect().executescript(SCHEMA)
+        self._migrate_columns()
+        self._connect().executescript(LIST_INDEXES)
+        self._migrate_legacy_tasks()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connect())
 
-    def _load_tasks(self):
-        if os.path.exists(self.db_file):
-            with open(self.db_file, 'r') as f:
-                self.tasks = json.load(f)
+    def _migrate_columns(self):
+        """给旧版数据库补上新增的列，并按 URL 回填主机"""
+        conn = self._connect()
+        missing = {}
+        for table, columns in (('tasks', ADDED_COLUMNS), ('workers', ADDED_WORKER_COLUMNS)):
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            missing[table] = [name for name in columns if name not in existing]
+        if not missing['tasks'] and not missing['workers']:
+            return
+        with self._transaction() as conn:
+            for name in missing['tasks']:
+                conn.execute(f'ALTER TABLE tasks ADD COLUMN {name} {ADDED_COLUMNS[name]}')
+            for name in missing['workers']:
+                conn.execute(f'ALTER TABLE workers ADD COLUMN {name} {ADDED_WORKER_COLUMNS[name]}')
+            if 'host' in missing['tasks']:
+                for row in conn.execute('SELECT id, url FROM tasks').fetchall():
+                    conn.execute('UPDATE tasks SET host = ? WHERE id = ?', (_host(row['url']), row['id']))
 
-    def _save_tasks(self):
-        os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
-        with open(self.db_file, 'w') as f:
-            json.dump(self.tasks, f, indent=2)
+    def _migrate_legacy_tasks(self):
+        """把旧版 JSON 文件中的任务导入 SQLite，导入后重命名旧文件"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        with open(self.legacy_file, 'r') as f:
+            tasks = json.load(f)
+        with self._transaction() as conn:
+            for task in tasks.values():
+                self._insert(conn, task)
+        os.replace(self.legacy_file, f"{self.legacy_file}.migrated")
+        print(f"已从 {self.legacy_file} 迁移 {len(tasks)} 个任务")
+
+    def _insert(self, conn, task):
+        row = {}
+        extra = {}
+        for key, value in task.items():
+            if key in TASK_COLUMNS:
+                row[key] = value
+            else:
+                extra[key] = value
+        row.setdefault('created_at', time.time())
+        row['host'] = _host(row.get('url'))
+        for key in JSON_COLUMNS:
+            row[key] = json.dumps(row.get(key) or [])
+        for key in BOOL_COLUMNS:
+            row[key] = int(bool(row.get(key)))
+        row['extra'] = json.dumps(extra, ensure_ascii=False)
+        columns = ', '.join(row)
+        placeholders = ', '.join(f':{key}' for key in row)
+        conn.execute(f'INSERT OR REPLACE INTO tasks ({columns}) VALUES ({placeholders})', row)
+
+    def _row_to_task(self, row):
+        task = dict(row)
+        extra = json.loads(task.pop('extra') or '{}')
+        for key in JSON_COLUMNS:
+            task[key] = json.loads(task[key])
+        for key in BOOL_COLUMNS:
+            task[key] = bool(task[key])
+        task.update(extra)
+        return task
 
     def add_task(self, monitor):
-        task_id = str(uuid4())
+        return self.add_tasks([monitor])[0]
+
+    def add_tasks(self, monitors, statuses=None):
+        """在一个事务中添加多个任务，返回任务 ID 列表；statuses 为各任务的初始状态，默认 running"""
+        now = time.time()
+        task_ids = []
+        with self._transaction() as conn:
+            for i, monitor in enumerate(monitors):
+                task_data = self._task_data(monitor)
+                # 同一批任务的创建时间依次递增，保持导入顺序
+                task_data['created_at'] = now + i * 1e-6
+                if statuses:
+                    task_data['status'] = statuses[i]
+                self._insert(conn, task_data)
+                task_ids.append(task_data['id'])
+        return task_ids
+
+    def _task_data(self, monitor):
         task_data = {
-            'id': task_id,
+            'id': str(uuid4()),
             'url': monitor.url,
             'mode': monitor.__class__.__name__.replace('Monitor', '').lower(),
             'interval': monitor.interval,
@@ -29,25 +230,256 @@ class Database:
             'send_mail': monitor.send_mail,
             'email_addresses': monitor.email_addresses,
             'cc_addresses': monitor.cc_addresses,
-            'status': 'running'
+            'etag': monitor.etag,
+            'last_modified': monitor.last_modified,
+            'next_due': monitor.next_due,
+            'status': 'running',
+            'route_key': monitor.share_key()
         }
-        
-        self.tasks[task_id] = task_data
-        self._save_tasks()
-        return task_id
+        task_data.update(monitor.options())
+        return task_data
 
     def get_task(self, task_id):
-        return self.tasks.get(task_id)
+        row = self._connect().execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return self._row_to_task(row) if row else None
 
     def get_all_tasks(self):
-        return list(self.tasks.values())
+        rows = self._connect().execute('SELECT * FROM tasks ORDER BY created_at').fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def get_tasks_by_status(self, status):
+        rows = self._connect().execute(
+            'SELECT * FROM tasks WHERE status = ? ORDER BY created_at', (status,)
+        ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def get_task_routes(self, status='running'):
+        """返回 [(任务 ID, route_key)]，集群分配任务时使用，不读取 extra；旧记录的 route_key 为 None"""
+        rows = self._connect().execute(
+            'SELECT id, route_key FROM tasks WHERE status = ? ORDER BY created_at', (status,)
+        ).fetchall()
+        return [(row['id'], row['route_key']) for row in rows]
+
+    def list_tasks(self, mode=None, status=None, host=None, changed_since=None,
+                   changed_before=None, offset=0, limit=50):
+        """按条件分页查询任务概要，返回 (任务列表, 总数)；按创建时间排序，条件列都有索引"""
+        where, params = _task_filter(mode, status, host, changed_since, changed_before)
+        conn = self._connect()
+        total = conn.execute(f'SELECT COUNT(*) FROM tasks {where}', params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {', '.join(LIST_COLUMNS)} FROM tasks {where} "
+            'ORDER BY created_at, id LIMIT ? OFFSET ?',
+            params + [limit, offset]
+        ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def _select_tasks(self, columns, ids=None, **filters):
+        """按条件查询任务行；指定 ids 时分批查询，避免超出 SQLite 的参数个数上限"""
+        conn = self._connect()
+        rows = []
+        for batch in ([None] if ids is None else _chunks(ids)):
+            where, params = _task_filter(ids=batch, **filters)
+            rows.extend(conn.execute(
+                f'SELECT {columns} FROM tasks {where} ORDER BY created_at, id', params
+            ).fetchall())
+        if ids is not None:
+            rows.sort(key=lambda row: (row['created_at'], row['id']))
+        return rows
+
+    def find_tasks(self, **filters):
+        """返回符合条件的完整任务记录，条件同 list_tasks，另可用 ids 限定任务 ID"""
+        return [self._row_to_task(row) for row in self._select_tasks('*', **filters)]
+
+    def find_task_ids(self, **filters):
+        return [row['id'] for row in self._select_tasks('id, created_at', **filters)]
+
+    def get_tasks_checked_since(self, since):
+        """返回 since 之后有检查记录的任务概要，供状态推送使用"""
+        rows = self._connect().execute(
+            f"SELECT {', '.join(LIST_COLUMNS)} FROM tasks WHERE last_checked > ? ORDER BY last_checked",
+            (since,)
+        ).fetchall()
+        return [dict(row) for row in rows]
 
     def delete_task(self, task_id):
-        if task_id in self.tasks:
-            del self.tasks[task_id]
-            self._save_tasks()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            conn.execute('DELETE FROM check_results WHERE task_id = ?', (task_id,))
+            conn.execute('DELETE FROM notifications WHERE task_id = ?', (task_id,))
+
+    def delete_tasks(self, task_ids):
+        """在一个事务中删除多个任务及其检查和通知记录"""
+        with self._transaction() as conn:
+            for chunk in _chunks(task_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                conn.execute(f'DELETE FROM tasks WHERE id IN ({placeholders})', chunk)
+                conn.execute(f'DELETE FROM check_results WHERE task_id IN ({placeholders})', chunk)
+                conn.execute(f'DELETE FROM notifications WHERE task_id IN ({placeholders})', chunk)
+
+    def update_tasks_status(self, task_ids, status):
+        with self._transaction() as conn:
+            for chunk in _chunks(task_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                conn.execute(f'UPDATE tasks SET status = ? WHERE id IN ({placeholders})', [status] + chunk)
+
+    def update_task(self, task_id, **fields):
+        self.update_tasks([task_id], **fields)
+
+    def update_tasks(self, task_ids, **fields):
+        """在一个事务中把相同的字段写入多个任务"""
+        columns = {}
+        extra = {}
+        for key, value in fields.items():
+            if key == 'id':
+                continue
+            if key in JSON_COLUMNS:
+                columns[key] = json.dumps(value or [])
+            elif key in BOOL_COLUMNS:
+                columns[key] = int(bool(value))
+            elif key in TASK_COLUMNS:
+                columns[key] = value
+            else:
+                extra[key] = value
+
+        with self._transaction() as conn:
+            for task_id in task_ids:
+                if columns:
+                    assignments = ', '.join(f'{key} = :{key}' for key in columns)
+                    conn.execute(f'UPDATE tasks SET {assignments} WHERE id = :task_id',
+                                 dict(columns, task_id=task_id))
+                if extra:
+                    row = conn.execute('SELECT extra FROM tasks WHERE id = ?', (task_id,)).fetchone()
+                    if row:
+                        merged = json.loads(row['extra'] or '{}')
+                        merged.update(extra)
+                        conn.execute('UPDATE tasks SET extra = ? WHERE id = ?',
+                                     (json.dumps(merged, ensure_ascii=False), task_id))
 
     def update_task_status(self, task_id, status):
-        if task_id in self.tasks:
-            self.tasks[task_id]['status'] = status
-            self._save_tasks()
\ No newline at end of file
+        self.update_task(task_id, status=status)
+
+    def record_check_result(self, task_id, result, duration=None, content_hash=None, error=None,
+                            changed=False):
+        """记录检查结果，同时更新任务的最近检查时间、结果和最近变化时间"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO check_results (task_id, checked_at, result, duration, content_hash, error) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (task_id, now, result, duration, content_hash, error)
+            )
+            conn.execute(
+                'UPDATE tasks SET last_checked = ?, last_result = ?, '
+                'last_changed = CASE WHEN ? THEN ? ELSE last_changed END WHERE id = ?',
+                (now, result, int(bool(changed)), now, task_id)
+            )
+            self._prune_check_results(conn, task_id, now)
+
+    def _prune_check_results(self, conn, task_id, now):
+        # 只清理当前任务，两条语句都走 (task_id, checked_at) 索引；暂停的任务不再产生记录，无需清理
+        keep_days = self.settings['results_keep_days']
+        if keep_days:
+            conn.execute(
+                'DELETE FROM check_results WHERE task_id = ? AND checked_at < ?',
+                (task_id, now - float(keep_days) * 86400)
+            )
+        keep_last = self.settings['results_keep_last']
+        if keep_last:
+            conn.execute(
+                'DELETE FROM check_results WHERE task_id = ? AND checked_at < ('
+                'SELECT checked_at FROM check_results WHERE task_id = ? '
+                'ORDER BY checked_at DESC LIMIT 1 OFFSET ?)',
+                (task_id, task_id, int(keep_last) - 1)
+            )
+
+    def get_check_results(self, task_id, limit=50):
+        rows = self._connect().execute(
+            'SELECT * FROM check_results WHERE task_id = ? ORDER BY checked_at DESC LIMIT ?',
+            (task_id, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_notification(self, task_id, recipients, success):
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO notifications (task_id, sent_at, recipients, success) VALUES (?, ?, ?, ?)',
+                (task_id, time.time(), json.dumps(recipients), int(bool(success)))
+            )
+
+    def heartbeat_worker(self, worker_id, host, pid, task_count, metrics_address=None, hosts=None):
+        """登记工作进程并刷新心跳时间，同时上报其指标地址和各主机的熔断状态"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT INTO workers (id, host, pid, started_at, heartbeat_at, task_count, metrics_address, hosts) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at, '
+                'task_count = excluded.task_count, metrics_address = excluded.metrics_address, '
+                'hosts = excluded.hosts',
+                (worker_id, host, pid, now, now, task_count, metrics_address,
+                 json.dumps(hosts or {}, ensure_ascii=False))
+            )
+
+    def get_live_workers(self, ttl):
+        """返回 ttl 秒内有心跳的工作进程"""
+        rows = self._connect().execute(
+            'SELECT * FROM workers WHERE heartbeat_at > ? ORDER BY id', (time.time() - ttl,)
+        ).fetchall()
+        workers = []
+        for row in rows:
+            worker = dict(row)
+            worker['hosts'] = json.loads(worker['hosts'] or '{}')
+            workers.append(worker)
+        return workers
+
+    def remove_worker(self, worker_id):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM workers WHERE id = ?', (worker_id,))
+
+
+def _host(url):
+    return urlparse(url or '').hostname or ''
+
+
+def _task_filter(mode=None, status=None, host=None, changed_since=None, changed_before=None, ids=None):
+    """生成任务筛选的 WHERE 子句和参数"""
+    conditions = []
+    params = []
+    if ids is not None:
+        conditions.append(f"id IN ({', '.join('?' * len(ids))})")
+        params.extend(ids)
+    for column, value in (('mode', mode), ('status', status), ('host', host)):
+        if value:
+            conditions.append(f'{column} = ?')
+            params.append(value)
+    if changed_since is not None:
+        conditions.append('last_changed >= ?')
+        params.append(changed_since)
+    if changed_before is not None:
+        conditions.append('last_changed < ?')
+        params.append(changed_before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, params
+
+
+def _chunks(items, size=500):
+    """按 SQLite 参数个数上限分批"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
@@ -0,0 +1,115 @@
+import re
+
+DEFAULT_KEYWORDS = [
+    'CVE', 'OpenSSL', 'security', 'vulnerability', 'exploit', 'advisory',
+    '安全', '漏洞', '升级', '版本', 'version', 'release',
+]
+
+TAG = re.compile(r'<[^>]*>')
+ATTRIBUTE_VALUE = re.compile(r'=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+WHITESPACE = re.compile(r'\s+')
+
+
+class DiffDigest:
+    """发送给 AI 之前压缩变动内容
+
+    依次去掉重复的 hunk、只有 HTML 标记（标签、属性名、空白）变化的 hunk，按关键字相关度排序后
+    在 token 预算内选取 hunk（按原顺序输出），并注明省略了多少内容。
+    token 数按 字符数 / chars_per_token 估算。所有 hunk 都被去掉时返回 None。
+    """
+
+    def __init__(self, token_budget=4000, chars_per_token=3.0, keywords=None):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.keywords = [k.lower() for k in (keywords or DEFAULT_KEYWORDS)]
+
+    def estimate_tokens(self, text):
+        return int(len(text) / self.chars_per_token) + 1
+
+    def _split_hunks(self, diff):
+        header = []
+        hunks = []
+        for line in diff.splitlines():
+            if line.startswith('@@'):
+                hunks.append([line])
+            elif hunks:
+                hunks[-1].append(line)
+            else:
+                header.append(line)
+        if not hunks:
+            # 不是 unified diff（如订阅条目变化），整体作为一个块
+            return [], [header]
+        return header, hunks
+
+    @staticmethod
+    def _changed_lines(hunk):
+        return [line for line in hunk[1:] if line[:1] in ('+', '-')]
+
+    @staticmethod
+    def _strip_markup(line):
+        # 去掉标签名、属性名和空白，保留属性值（如链接中的版本号）
+        text = TAG.sub(lambda tag: ' '.join(ATTRIBUTE_VALUE.findall(tag.group())), line)
+        return WHITESPACE.sub('', text)
+
+    @classmethod
+    def _is_markup_only(cls, changed):
+        removed = sorted(cls._strip_markup(line[1:]) for line in changed if line.startswith('-'))
+        added = sorted(cls._strip_markup(line[1:]) for line in changed if line.startswith('+'))
+        return removed == added
+
+    def _score(self, changed):
+        text = '\n'.join(changed).lower()
+        return sum(text.count(keyword) for keyword in self.keywords)
+
+    def prepare(self, diff):
+        header, hunks = self._split_hunks(diff)
+        if not header and len(hunks) == 1:
+            return self._truncate('\n'.join(hunks[0]), self.token_budget)
+
+        seen = set()
+        candidates = []
+        duplicates = markup_only = 0
+        for index, hunk in enumerate(hunks):
+            changed = self._changed_lines(hunk)
+            key = '\n'.join(changed)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            if changed and self._is_markup_only(changed):
+                markup_only += 1
+                continue
+            candidates.append((index, hunk, self._score(changed)))
+        if not candidates:
+            return None
+
+        budget = self.token_budget - self.estimate_tokens('\n'.join(header))
+        selected = []
+        for index, hunk, score in sorted(candidates, key=lambda c: (-c[2], c[0])):
+            text = '\n'.join(hunk)
+            cost = self.estimate_tokens(text)
+            if cost <= budget:
+                selected.append((index, text))
+                budget -= cost
+            elif not selected:
+                selected.append((index, self._truncate(text, budget)))
+                budget = 0
+        omitted = len(candidates) - len(selected)
+
+        parts = header + [text for _, text in sorted(selected)]
+        notes = []
+        if duplicates:
+            notes.append(f"{duplicates} 个重复变化")
+        if markup_only:
+            notes.append(f"{markup_only} 个仅标记变化")
+        if omitted:
+            notes.append(f"{omitted} 个相关度较低的变化（超出长度限制）")
+        if notes:
+            parts.append(f"... 已省略 {'、'.join(notes)}")
+        return '\n'.join(parts)
+
+    def _truncate(self, text, budget):
+        max_chars = int(max(budget, 0) * self.chars_per_token)
+        if len(text) <= max_chars:
+            return text
+        return text[:max_chars] + f"\n... 已截断，原始长度 {len(text)} 字符"
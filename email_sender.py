@@ -1,32 +1,19 @@
-import requests
-import json
-import os
+import functools
+import re
 import smtplib
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from config_cache import load_config
+from http_client import get_http_client
 
-class EmailSender:
-    def __init__(self):
-        self.email_settings = self._load_email_settings()
-        self.template_settings = self._load_template_settings()
-        self.sendcloud_api_url = "https://api.sendcloud.net/apiv2/mail/send"
+EMAIL_SETTINGS_FILE = 'config/email_settings.json'
+EMAIL_TEMPLATE_FILE = 'config/email_template.json'
 
-    def _load_email_settings(self):
-        settings_file = 'config/email_settings.json'
-        if os.path.exists(settings_file):
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
-
-    def _load_template_settings(self):
-        template_file = 'config/email_template.json'
-        if os.path.exists(template_file):
-            with open(template_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {
-            'subject_template': '[{{website_name}}] 网站更新通知',
-            'body_template': '''
+DEFAULT_EMAIL_TEMPLATE = {
+    'subject_template': '[{{website_name}}] 网站更新通知',
+    'body_template': '''
 网站: {{website_name}}
 URL: {{url}}
 检测时间: {{change_time}}
@@ -36,25 +23,62 @@ URL: {{url}}
 
 {{ai_analysis}}
             ''',
-            'ai_analysis_template': '''
+    'ai_analysis_template': '''
 AI分析结果:
 {{ai_result}}
             '''
-        }
+}
+
+TEMPLATE_VARIABLE = re.compile(r'\{\{(\w+)\}\}')
+
+
+class CompiledTemplate:
+    """预编译的邮件模板，渲染时一次扫描完成所有变量替换，未提供的变量原样保留"""
+
+    def __init__(self, template):
+        parts = TEMPLATE_VARIABLE.split(template)
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+
+    def render(self, **kwargs):
+        rendered = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            if name in kwargs:
+                rendered.append(str(kwargs[name]))
+            else:
+                rendered.append(f'{{{{{name}}}}}')
+            rendered.append(literal)
+        return ''.join(rendered)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_template(template):
+    return CompiledTemplate(template)
+
+
+class EmailSender:
+    def __init__(self):
+        self.sendcloud_api_url = "https://api.sendcloud.net/apiv2/mail/send"
+        # 复用的 SMTP 连接，发送前用 NOOP 检查是否仍然可用
+        self._smtp = None
+        self._smtp_settings = None
+        self._smtp_lock = threading.Lock()
+
+    @property
+    def email_settings(self):
+        # 配置文件未修改时使用缓存，不重复读取磁盘
+        return load_config(EMAIL_SETTINGS_FILE, {})
+
+    @property
+    def template_settings(self):
+        return load_config(EMAIL_TEMPLATE_FILE, DEFAULT_EMAIL_TEMPLATE)
 
     def _render_template(self, template, **kwargs):
         """渲染邮件模板"""
-        rendered = template
-        for key, value in kwargs.items():
-            rendered = rendered.replace(f'{{{{{key}}}}}', str(value))
-        return rendered
-
-    def send_mail(self, subject=None, content=None, recipients=[], cc_recipients=None, 
-                  website_name="", url="", changes="", ai_result=None):
-        if not self.email_settings:
-            print("邮件设置未配置")
-            return False
+        return _compile_template(template).render(**kwargs)
 
+    def render(self, website_name="", url="", changes="", ai_result=None):
+        """按模板生成邮件主题和正文"""
         # 准备模板变量
         template_vars = {
             'website_name': website_name,
@@ -72,18 +96,27 @@ AI分析结果:
             )
             template_vars['ai_analysis'] = ai_analysis
 
+        subject = self._render_template(
+            self.template_settings.get('subject_template', '[{{website_name}}] 网站更新通知'),
+            **template_vars
+        )
+        content = self._render_template(
+            self.template_settings.get('body_template', '{{changes}}'),
+            **template_vars
+        )
+        return subject, content
+
+    def send_mail(self, subject=None, content=None, recipients=[], cc_recipients=None, 
+                  website_name="", url="", changes="", ai_result=None):
+        if not self.email_settings:
+            print("邮件设置未配置")
+            return False
+
         # 使用模板或直接使用传入的内容
-        if not subject:
-            subject = self._render_template(
-                self.template_settings.get('subject_template', '[{{website_name}}] 网站更新通知'),
-                **template_vars
-            )
-        
-        if not content:
-            content = self._render_template(
-                self.template_settings.get('body_template', '{{changes}}'),
-                **template_vars
-            )
+        if not subject or not content:
+            rendered_subject, rendered_content = self.render(website_name, url, changes, ai_result)
+            subject = subject or rendered_subject
+            content = content or rendered_content
 
         # 根据配置的服务类型发送邮件
         service_type = self.email_settings.get('service_type', 'sendcloud')
@@ -115,7 +148,7 @@ AI分析结果:
             params["cc"] = ', '.join(cc_recipients)
 
         try:
-            response = requests.post(self.sendcloud_api_url, files={}, data=params)
+            response = get_http_client().post(self.sendcloud_api_url, files={}, data=params)
             
             if response.status_code == 200:
                 result = response.json()
@@ -148,33 +181,71 @@ AI分析结果:
             # 添加邮件正文
             msg.attach(MIMEText(content, 'plain', 'utf-8'))
             
-            # 连接SMTP服务器
-            server = smtplib.SMTP(
-                self.email_settings.get('smtp_server'),
-                int(self.email_settings.get('smtp_port', 587))
-            )
-            server.starttls()
-            server.login(
-                self.email_settings.get('email_account'),
-                self.email_settings.get('email_password')
-            )
-            
-            # 发送邮件
+            # 发送邮件，复用的连接已被服务器断开时重连一次
             all_recipients = recipients + (cc_recipients or [])
-            server.sendmail(
-                self.email_settings.get('email_account'),
-                all_recipients,
-                msg.as_string()
-            )
-            server.quit()
+            with self._smtp_lock:
+                try:
+                    self._get_smtp().sendmail(
+                        self.email_settings.get('email_account'),
+                        all_recipients,
+                        msg.as_string()
+                    )
+                except smtplib.SMTPServerDisconnected:
+                    self._smtp = None
+                    self._get_smtp().sendmail(
+                        self.email_settings.get('email_account'),
+                        all_recipients,
+                        msg.as_string()
+                    )
             
             print("SMTP 邮件发送成功")
             return True
             
         except Exception as e:
             print(f"SMTP 发送邮件失败: {str(e)}")
+            self.close()
             return False
 
+    def _get_smtp(self):
+        """返回已登录的 SMTP 连接，没有可用连接或邮件设置已修改时新建"""
+        settings = self.email_settings
+        if self._smtp is not None:
+            if self._smtp_settings is settings:
+                try:
+                    if self._smtp.noop()[0] == 250:
+                        return self._smtp
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self._close_smtp()
+
+        # 连接SMTP服务器
+        server = smtplib.SMTP(
+            settings.get('smtp_server'),
+            int(settings.get('smtp_port', 587))
+        )
+        # 内网中继或本地测试服务器可以在设置中关闭 STARTTLS
+        if settings.get('smtp_starttls', True):
+            server.starttls()
+        server.login(
+            settings.get('email_account'),
+            settings.get('email_password')
+        )
+        self._smtp = server
+        self._smtp_settings = settings
+        return server
+
+    def _close_smtp(self):
+        server, self._smtp = self._smtp, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+    def close(self):
+        with self._smtp_lock:
+            self._close_smtp()
+
 # if __name__ == "__main__":
 #     email_sender = EmailSender()
 #     email_sender.send_mail("测试邮件", "这是一封测试邮件", ["Wafi_Wang@asus.com"])
\ No newline at end of file
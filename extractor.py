@@ -0,0 +1,84 @@
+import re
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+
+class ContentExtractor:
+    """从网页中提取需要监控的区域并去除噪声
+
+    - include_selectors: 只保留匹配的 CSS 选择器区域
+    - exclude_selectors: 删除匹配的区域（广告、脚本等）
+    - xpath: 用 XPath 选择区域，需要安装 lxml；配置后忽略 CSS 选择器
+    - normalizers: 正则规则，字符串表示删除匹配内容，
+      {"pattern": ..., "replace": ...} 表示替换（如时间戳、CSRF token）
+    - parser: BeautifulSoup 使用的解析器，html.parser 或 lxml
+
+    未配置任何规则时与原来一样返回 prettify 后的整个文档。
+    """
+
+    PARSERS = ('html.parser', 'lxml')
+
+    def __init__(self, include_selectors=None, exclude_selectors=None, xpath=None,
+                 normalizers=None, parser='html.parser'):
+        self.include_selectors = include_selectors or []
+        self.exclude_selectors = exclude_selectors or []
+        self.xpath = xpath
+        self.parser = parser or 'html.parser'
+
+        if self.parser not in self.PARSERS:
+            raise ValueError(f"不支持的解析器: {self.parser}")
+        if (self.parser == 'lxml' or self.xpath) and lxml_html is None:
+            raise ValueError("使用 lxml 解析器或 XPath 需要安装 lxml")
+
+        if not isinstance(normalizers or [], (list, tuple)):
+            raise ValueError("normalizers 必须是规则列表")
+        self.normalizers = []
+        for rule in normalizers or []:
+            if isinstance(rule, str):
+                pattern, replace = rule, ''
+            elif isinstance(rule, dict) and isinstance(rule.get('pattern'), str):
+                pattern, replace = rule['pattern'], rule.get('replace') or ''
+                if not isinstance(replace, str):
+                    raise ValueError(f"替换内容必须是字符串: {rule}")
+            else:
+                raise ValueError(f"无效的归一化规则 {rule!r}，应为正则字符串或 {{\"pattern\": ..., \"replace\": ...}}")
+            try:
+                self.normalizers.append((re.compile(pattern), replace))
+            except re.error as e:
+                raise ValueError(f"无效的正则表达式 {pattern}: {e}")
+
+    def extract(self, text):
+        if self.xpath:
+            content = self._extract_xpath(text)
+        else:
+            content = self._extract_soup(text)
+        for pattern, replace in self.normalizers:
+            content = pattern.sub(replace, content)
+        return content
+
+    def _extract_soup(self, text):
+        soup = BeautifulSoup(text, self.parser)
+        for selector in self.exclude_selectors:
+            for element in soup.select(selector):
+                element.decompose()
+        if not self.include_selectors:
+            return soup.prettify()
+
+        parts = []
+        for selector in self.include_selectors:
+            parts.extend(element.prettify() for element in soup.select(selector))
+        return '\n'.join(parts)
+
+    def _extract_xpath(self, text):
+        tree = lxml_html.fromstring(text)
+        parts = []
+        for result in tree.xpath(self.xpath):
+            if isinstance(result, str):
+                parts.append(result)
+            else:
+                parts.append(lxml_html.tostring(result, encoding='unicode', pretty_print=True))
+        return '\n'.join(parts)
@@ -0,0 +1,193 @@
+import threading
+import time
+from config_cache import load_settings
+
+DEFAULT_HOST_SETTINGS = {
+    # 每个主机每秒允许的请求数和突发请求数（令牌桶）；限速和熔断按进程计算，
+    # 集群模式下同一主机的任务分布在 N 个工作进程中时，实际上限为 N 倍
+    'rate_per_second': 5.0,
+    'burst': 1,
+    # 连续失败多少次后暂停访问该主机
+    'failure_threshold': 5,
+    # 首次暂停的秒数，之后每次探测失败翻倍，最长 max_backoff 秒
+    'base_backoff': 30,
+    'max_backoff': 3600,
+    # 探测请求超过该秒数仍未返回结果时允许再次探测
+    'probe_timeout': 120,
+}
+
+
+class HostUnavailable(Exception):
+    """主机熔断期间跳过请求"""
+    pass
+
+
+class TokenBucket:
+    """令牌桶：令牌不足时返回可以执行的最早时间，并预留该令牌"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+
+    def reserve(self, now):
+        if self.rate <= 0:
+            return now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return now
+        return now + -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """熔断器
+
+    closed: 正常访问；连续失败 failure_threshold 次后进入 open，暂停访问一段时间；
+    暂停结束后进入 half_open，只放行一个探测请求，成功则恢复，失败则以翻倍的时间重新暂停。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, base_backoff=30, max_backoff=3600, probe_timeout=120):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0
+        self.probe_started = 0
+        self.last_error = None
+
+    def allow(self, now):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if now < self.open_until:
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_started = now
+            return True
+        # half_open: 探测请求进行中，除非探测超时，否则不放行其他请求
+        if now - self.probe_started > self.probe_timeout:
+            self.probe_started = now
+            return True
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error = None
+
+    def record_failure(self, now, error=None):
+        self.last_error = error
+        if self.state == self.OPEN:
+            # 熔断前已发出的请求陆续失败，不再延长暂停时间
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trips += 1
+            backoff = min(self.base_backoff * 2 ** (self.trips - 1), self.max_backoff)
+            self.state = self.OPEN
+            self.open_until = now + backoff
+
+    def to_dict(self, now):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'retry_in': max(0, round(self.open_until - now, 1)) if self.state == self.OPEN else 0,
+            'last_error': self.last_error,
+        }
+
+
+class HostGuard:
+    """按主机限制请求频率并在主机持续失败时熔断
+
+    调度器通过 reserve 为每次检查预留令牌；监控任务请求前调用 allow，
+    请求结束后用 record_success/record_failure 反馈结果。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_HOST_SETTINGS)
+        self.settings.update(settings or {})
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                failure_threshold=int(self.settings['failure_threshold']),
+                base_backoff=float(self.settings['base_backoff']),
+                max_backoff=float(self.settings['max_backoff']),
+                probe_timeout=float(self.settings['probe_timeout'])
+            )
+        return breaker
+
+    def reserve(self, host, now=None):
+        """预留一次请求，返回可以执行的最早时间"""
+        now = time.time() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(
+                    float(self.settings['rate_per_second']),
+                    float(self.settings['burst'])
+                )
+            return bucket.reserve(now)
+
+    def allow(self, host):
+        with self._lock:
+            return self._breaker(host).allow(time.time())
+
+    def check(self, host):
+        """熔断期间抛出 HostUnavailable"""
+        if not self.allow(host):
+            raise HostUnavailable(f"主机 {host} 连续请求失败，暂停访问中")
+
+    def record_success(self, host):
+        with self._lock:
+            self._breaker(host).record_success()
+
+    def record_failure(self, host, error=None):
+        now = time.time()
+        with self._lock:
+            breaker = self._breaker(host)
+            was_open = breaker.state == CircuitBreaker.OPEN
+            breaker.record_failure(now, error)
+            if breaker.state == CircuitBreaker.OPEN and not was_open:
+                print(f"主机 {host} 连续失败 {breaker.failures} 次，暂停访问 {round(breaker.open_until - now)} 秒")
+
+    def state(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                return None
+            return breaker.to_dict(time.time())
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {host: breaker.to_dict(now) for host, breaker in self._breakers.items()}
+
+
+_host_guard = None
+_host_guard_lock = threading.Lock()
+
+
+def get_host_guard():
+    """返回进程内共享的主机限流/熔断器，配置读取自 config/host_settings.json"""
+    global _host_guard
+    with _host_guard_lock:
+        if _host_guard is None:
+            _host_guard = HostGuard(load_settings('config/host_settings.json', DEFAULT_HOST_SETTINGS))
+        return _host_guard
@@ -0,0 +1,133 @@
+import hashlib
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from config_cache import load_settings
+
+DEFAULT_HTTP_SETTINGS = {
+    'connect_timeout': 5,
+    'read_timeout': 30,
+    # 缓存连接池的主机数量
+    'pool_connections': 100,
+    # 每个主机的最大连接数，超出时等待空闲连接而不是新建
+    'pool_maxsize': 10,
+    # 响应体大小上限，超过时中止下载
+    'max_body_size': 10 * 1024 * 1024,
+    # 响应体超过该大小时写入临时文件而不是留在内存中
+    'spool_size': 1024 * 1024,
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class StreamedBody:
+    """流式下载的响应体
+
+    边下载边计算 MD5，超过 max_body_size 立即中止；超过 spool_size 的部分写入临时文件，
+    只有真正需要解析时才通过 content/text 读回内存。
+    """
+
+    def __init__(self, response, max_body_size, spool_size):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.encoding = response.encoding or 'utf-8'
+        self.size = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        digest = hashlib.md5()
+        try:
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > max_body_size:
+                raise ResponseTooLarge(f"响应体 {declared} 字节超过上限 {max_body_size}")
+            for chunk in response.iter_content(CHUNK_SIZE):
+                self.size += len(chunk)
+                if self.size > max_body_size:
+                    raise ResponseTooLarge(f"响应体超过上限 {max_body_size} 字节")
+                digest.update(chunk)
+                self._file.write(chunk)
+        except Exception:
+            self._file.close()
+            raise
+        finally:
+            response.close()
+        self.hash = digest.hexdigest()
+
+    @property
+    def content(self):
+        self._file.seek(0)
+        return self._file.read()
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def close(self):
+        self._file.close()
+
+
+class HttpClient:
+    """所有监控任务和邮件发送共用的 HTTP 客户端
+
+    基于 requests.Session 复用 keep-alive 连接，按主机限制连接数，并为每个请求设置
+    连接/读取超时，避免挂起的服务器卡住工作线程。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_HTTP_SETTINGS)
+        self.settings.update(settings or {})
+        self.timeout = (
+            float(self.settings['connect_timeout']),
+            float(self.settings['read_timeout'])
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=int(self.settings['pool_connections']),
+            pool_maxsize=int(self.settings['pool_maxsize']),
+            pool_block=True
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def fetch(self, url, **kwargs):
+        """流式 GET，返回 (响应, StreamedBody)；非 200 响应不读取响应体"""
+        response = self.get(url, stream=True, **kwargs)
+        if response.status_code != 200:
+            response.close()
+            return response, None
+        body = StreamedBody(
+            response,
+            int(self.settings['max_body_size']),
+            int(self.settings['spool_size'])
+        )
+        return response, body
+
+    def close(self):
+        self.session.close()
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """返回进程内共享的 HTTP 客户端，配置读取自 config/http_settings.json"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(load_settings('config/http_settings.json', DEFAULT_HTTP_SETTINGS))
+        return _http_client
@@ -0,0 +1,181 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def remove(self, labelname, value):
+        """删除标签 labelname 取值为 value 的所有序列"""
+        index = self.labelnames.index(labelname)
+        with self._lock:
+            for key in [key for key in self._values if key[index] == str(value)]:
+                del self._values[key]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [各分桶计数, 总和, 次数]
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+_registry = []
+
+STAGE_SECONDS = Histogram(
+    'webmonitor_stage_duration_seconds',
+    '检查各阶段耗时（fetch/parse/hash/diff/ai/snapshot/email）',
+    ('stage',)
+)
+TASK_STAGE_SECONDS = Counter(
+    'webmonitor_task_stage_seconds_total', '每个任务各阶段累计耗时', ('task', 'stage')
+)
+CHECKS = Counter('webmonitor_checks_total', '检查次数，按结果分类', ('result',))
+TASK_ERRORS = Counter('webmonitor_task_errors_total', '每个任务的检查出错次数', ('task',))
+HOST_ERRORS = Counter('webmonitor_host_errors_total', '每个主机的请求失败次数', ('host',))
+FETCH_RESPONSES = Counter(
+    'webmonitor_fetch_responses_total', '抓取响应数，按主机和状态码分类（可计算 304 比例）', ('host', 'status')
+)
+FETCH_BYTES = Counter('webmonitor_fetched_bytes_total', '下载的响应体字节数', ('host',))
+SCHEDULER_LAG = Histogram(
+    'webmonitor_scheduler_lag_seconds', '计划执行时间与实际开始检查之间的延迟',
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+)
+QUEUE_DEPTH = Gauge('webmonitor_queue_depth', '各队列中等待的项目数', ('queue',))
+SCHEDULED_TASKS = Gauge('webmonitor_scheduled_tasks', '调度器中的监控任务数')
+SHARED_CHECKS = Counter('webmonitor_shared_checks_total', '由同组任务代为完成、省去抓取和分析的检查次数')
+HOST_CIRCUIT_OPEN = Gauge('webmonitor_host_circuit_open', '主机是否处于熔断状态（1 为暂停访问）', ('host',))
+
+
+def update_runtime_gauges(scheduler, notifier, ai_service, host_guard):
+    """在输出指标前刷新队列深度和熔断状态"""
+    SCHEDULED_TASKS.set(scheduler.task_count())
+    QUEUE_DEPTH.set(scheduler.queue_depth(), queue='scheduler')
+    QUEUE_DEPTH.set(notifier.pending_count(), queue='notification')
+    QUEUE_DEPTH.set(ai_service.pending_count(), queue='ai')
+    HOST_CIRCUIT_OPEN.clear()
+    for host, state in host_guard.snapshot().items():
+        HOST_CIRCUIT_OPEN.set(1 if state['state'] != 'closed' else 0, host=host)
+
+
+def remove_task(task_id):
+    """任务删除（或在集群中移交给其他进程）后移除按任务统计的序列，避免 /metrics 无限增长"""
+    for metric in (TASK_STAGE_SECONDS, TASK_ERRORS):
+        metric.remove('task', task_id)
+
+
+def observe_stage(stage, seconds, task=None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if task:
+        TASK_STAGE_SECONDS.inc(seconds, task=task, stage=stage)
+
+
+@contextmanager
+def timed(stage, task=None):
+    """记录 with 代码块的耗时，出错时同样记录"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, task)
+
+
+def render():
+    """按 Prometheus 文本格式输出所有指标"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -1,189 +1,785 @@
-import requests
-from bs4 import BeautifulSoup
-import feedparser
-import time
-import threading
-import os
-from datetime import datetime
-import difflib
+import copy
+import hashlib
 import json
-from email_sender import EmailSender
-from ai import AiClient
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from notifier import Notification, get_notifier
+from events import get_event_bus
+from ai import ai_configured, get_ai_service
+from scheduler import get_scheduler
+from http_client import ResponseTooLarge, get_http_client
+from host_guard import HostUnavailable, get_host_guard
+from snapshot_store import get_snapshot_store
+from extractor import ContentExtractor
+import processing
+import metrics
+
+# 自适应轮询：未变化时间隔放大的倍数、保留的变化时间记录数、未指定上限时相对 interval 的倍数
+ADAPTIVE_BACKOFF = 1.5
+ADAPTIVE_HISTORY = 20
+ADAPTIVE_MAX_FACTOR = 16
+# 每个订阅任务最多记住的条目数
+FEED_SEEN_LIMIT = 1000
+
+def canonical_url(url):
+    """规范化 URL 用于判断任务是否监控同一地址：协议和主机小写、去掉默认端口和片段、查询参数排序"""
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
+    if ':' in host:
+        host = f'[{host}]'
+    if parts.port is not None and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username + (f':{parts.password}' if parts.password else '')
+        host = f'{userinfo}@{host}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, parts.path or '/', parts.params, query, ''))
+
+
+def _share_value(value):
+    # 整数和浮点数（如数据库读出的 5.0）视为相同
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
 
 class BaseMonitor:
+    # 除基本参数外需要随任务保存、重建时传回构造函数的参数
+    OPTION_KEYS = ('adaptive', 'min_interval', 'max_interval')
+    # 共享检查时由执行检查的任务交给接替者的状态
+    SHARED_STATE_ATTRS = (
+        'etag', 'last_modified', 'last_hash', 'last_snapshot', 'current_interval', 'change_times', 'next_due'
+    )
+
     def __init__(self, url, interval, compare_mode=False, send_mail=False, 
-                 email_addresses=None, cc_addresses=None):
+                 email_addresses=None, cc_addresses=None,
+                 adaptive=False, min_interval=None, max_interval=None):
         self.url = url
         self.interval = interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval or interval
+        self.max_interval = max_interval or interval * ADAPTIVE_MAX_FACTOR
+        self.current_interval = interval
+        self.change_times = []
         self.compare_mode = compare_mode
         self.send_mail = send_mail
         self.email_addresses = email_addresses or []
         self.cc_addresses = cc_addresses or []
         self.running = False
-        self.thread = None
-        self.last_content = None
-        self.snapshot_dir = 'website_snapshots'
+        self.scheduler = None
+        self.task_id = None
+        self.db = None
+        self._last_content = None
+        self.last_snapshot = None
+        # 基线快照由同组其他任务保存时，记录其快照键
+        self.snapshot_source = None
+        self.next_due = None
+        self.etag = None
+        self.last_modified = None
+        # 本次响应的 ETag/Last-Modified，检查结果持久化时才替换 etag/last_modified
+        self._pending_validators = None
+        self.last_hash = None
+        self.check_count = 0
+        self.not_modified_count = 0
+        self.hash_skip_count = 0
+        self.noise_skip_count = 0
+        self.circuit_skip_count = 0
+        self.snapshot_store = get_snapshot_store()
+
+    @classmethod
+    def from_task(cls, task):
+        """根据任务记录重建监控实例并恢复持久化的状态，基线内容在首次使用时才读取"""
+        monitor = cls(
+            url=task['url'],
+            interval=task['interval'],
+            compare_mode=task['compare_mode'],
+            send_mail=task['send_mail'],
+            email_addresses=task['email_addresses'],
+            cc_addresses=task['cc_addresses'],
+            **{key: task[key] for key in cls.OPTION_KEYS if key in task}
+        )
+        monitor.task_id = task['id']
+        monitor._restore_state(task)
+        return monitor
+
+    def options(self):
+        return {key: getattr(self, key) for key in self.OPTION_KEYS}
+
+    @classmethod
+    def share_url(cls, url):
+        return canonical_url(url)
+
+    @classmethod
+    def task_share_key(cls, task):
+        """共享键：地址、提取配置、检查间隔和对比模式都相同的任务共用一次抓取、解析和对比"""
+        options = {key: _share_value(task.get(key)) for key in cls.OPTION_KEYS}
+        return json.dumps(
+            [cls.__name__, cls.share_url(task['url']), _share_value(task['interval']),
+             bool(task['compare_mode']), options],
+            sort_keys=True, ensure_ascii=False, default=str
+        )
 
-    def start(self):
+    def share_key(self):
+        return self.task_share_key(dict(
+            self.options(), url=self.url, interval=self.interval, compare_mode=self.compare_mode
+        ))
+
+    def _restore_state(self, task):
+        self.current_interval = task.get('current_interval') or self.interval
+        self.change_times = task.get('change_times') or []
+        self.etag = task.get('etag')
+        self.last_modified = task.get('last_modified')
+        self.last_hash = task.get('last_hash')
+        self.last_snapshot = task.get('last_snapshot')
+        self.snapshot_source = task.get('snapshot_source')
+        self.next_due = task.get('next_due')
+
+    @property
+    def last_content(self):
+        if self._last_content is None and self.last_snapshot:
+            try:
+                self._last_content = self.snapshot_store.load(
+                    self.snapshot_source or self._snapshot_key(), self.last_snapshot
+                )
+            except (OSError, KeyError) as e:
+                print(f"读取基线快照失败: {e}")
+                self.last_snapshot = None
+                self.last_hash = None
+        return self._last_content
+
+    @last_content.setter
+    def last_content(self, content):
+        self._last_content = content
+
+    def _has_baseline(self):
+        return self._last_content is not None or bool(self.last_snapshot)
+
+    def start(self, scheduler=None, delay=0):
         if not self.running:
             self.running = True
-            self.thread = threading.Thread(target=self._monitor_loop)
-            self.thread.daemon = True
-            self.thread.start()
+            if scheduler is not None:
+                self.scheduler = scheduler
+            elif self.scheduler is None:
+                self.scheduler = get_scheduler()
+            get_check_groups().join(self, delay)
 
     def pause(self):
         self.running = False
-        if self.thread:
-            self.thread.join()
+        get_check_groups().leave(self)
 
-    def _monitor_loop(self):
-        while self.running:
-            try:
-                self._check_changes()
-            except Exception as e:
-                print(f"监控出错: {str(e)}")
-            time.sleep(self.interval * 60)
+    def inherit_state(self, leader):
+        """接替同组中停止的任务执行检查，沿用其抓取和对比状态"""
+        for attr in self.SHARED_STATE_ATTRS:
+            setattr(self, attr, copy.copy(getattr(leader, attr)))
+        self._last_content = leader._last_content
+        self.snapshot_source = leader.snapshot_source or leader._snapshot_key()
+
+    def run_check(self):
+        """由调度器在工作线程中调用，执行一次检查"""
+        if not self.running:
+            return
+        self.check_count += 1
+        not_modified_count = self.not_modified_count
+        hash_skip_count = self.hash_skip_count
+        noise_skip_count = self.noise_skip_count
+        previous_hash = self.last_hash
+        started = time.monotonic()
+        error = None
+        skipped = False
+        try:
+            self._check_changes()
+        except HostUnavailable as e:
+            error = str(e)
+            skipped = True
+            self.circuit_skip_count += 1
+        except Exception as e:
+            error = str(e)
+            print(f"监控出错: {error}")
+
+        if skipped:
+            result = 'circuit_open'
+        elif error:
+            result = 'error'
+        elif self.not_modified_count > not_modified_count:
+            result = 'not_modified'
+        elif self.hash_skip_count > hash_skip_count:
+            result = 'unchanged'
+        else:
+            result = 'checked'
+        metrics.CHECKS.inc(result=result)
+        if result == 'error':
+            metrics.TASK_ERRORS.inc(task=self._metric_task())
+        # 内容有变化（不含只有噪声变化的情况），用于任务列表的最近变化时间和自适应间隔
+        content_changed = (result == 'checked' and previous_hash is not None
+                           and self.last_hash != previous_hash
+                           and self.noise_skip_count == noise_skip_count)
+        duration = time.monotonic() - started
+        # 同组任务共用本次检查的结果
+        followers = get_check_groups().followers(self)
+        if followers:
+            metrics.SHARED_CHECKS.inc(len(followers))
+        for monitor in [self] + followers:
+            monitor._record_check(result, duration, self.last_hash, error, content_changed)
+        if self.adaptive and not error:
+            # 只有噪声变化时按未变化处理，继续放宽间隔
+            self._adapt_interval(content_changed)
+
+    def _record_check(self, result, duration, content_hash, error, changed):
+        if self.db and self.task_id:
+            self.db.record_check_result(
+                self.task_id, result,
+                duration=duration,
+                content_hash=content_hash,
+                error=error,
+                changed=changed
+            )
+        self._publish_check(result, error, changed)
+
+    def _publish_check(self, result, error, changed):
+        """把本次检查结果推送给订阅了状态更新的页面"""
+        event_bus = get_event_bus()
+        if not self.task_id or not event_bus.subscriber_count():
+            return
+        now = time.time()
+        event = {
+            'type': 'check',
+            'id': self.task_id,
+            'last_checked': now,
+            'last_result': result,
+            'error': error,
+        }
+        if changed:
+            event['last_changed'] = now
+        event_bus.publish(event)
+
+    def _adapt_interval(self, changed):
+        """自适应轮询：内容变化时按观测到的变化间隔收紧，未变化时逐步放宽"""
+        current = self.current_interval
+        if changed:
+            self.change_times = (self.change_times + [time.time()])[-ADAPTIVE_HISTORY:]
+            gaps = [b - a for a, b in zip(self.change_times, self.change_times[1:])]
+            if gaps:
+                # 以变化间隔中位数的一半轮询，保证每次变化至少被检查到一次
+                current = statistics.median(gaps) / 60 / 2
+            else:
+                current = current / 2
+        else:
+            current = current * ADAPTIVE_BACKOFF
+        current = min(max(current, self.min_interval), self.max_interval)
+
+        if changed or current != self.current_interval:
+            self.current_interval = current
+            self._save_state(current_interval=current, change_times=self.change_times)
+
+    def _metric_task(self):
+        return self.task_id or self.url
+
+    def _timed(self, stage):
+        return metrics.timed(stage, self._metric_task())
+
+    def period(self):
+        """检查间隔（秒），自适应模式下使用当前调整后的间隔"""
+        if self.adaptive:
+            return self.current_interval * 60
+        return self.interval * 60
+
+    def set_next_due(self, next_due):
+        """记录调度器安排的下次检查时间"""
+        self.next_due = next_due
+        self._save_state(next_due=next_due)
+
+    def get_stats(self):
+        group = get_check_groups()
+        leader = group.leader_of(self)
+        if leader is not None and leader is not self:
+            # 由同组任务代为检查，返回其统计
+            stats = leader.get_stats()
+            stats['shared_with'] = leader.task_id
+            return stats
+        return {
+            'shared_tasks': len(group.followers(self)),
+            'check_count': self.check_count,
+            'not_modified_count': self.not_modified_count,
+            'hash_skip_count': self.hash_skip_count,
+            'noise_skip_count': self.noise_skip_count,
+            'circuit_skip_count': self.circuit_skip_count,
+            'current_interval': self.current_interval,
+            'host': get_host_guard().state(urlparse(self.url).hostname or ''),
+        }
 
     def _check_changes(self):
         raise NotImplementedError
 
+    def _get_content_hash(self, content):
+        """计算内容的哈希值"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.md5(content).hexdigest()
+
+    def _hash_unchanged(self, content_hash):
+        """快速路径：哈希与上次相同则跳过解析、对比和快照"""
+        if content_hash == self.last_hash:
+            self.hash_skip_count += 1
+            # 内容与已保存的状态一致，可以直接采用新的验证器
+            validators = self._take_validators()
+            if validators:
+                self._save_state(**validators)
+            return True
+        return False
+
+    def _take_validators(self):
+        """取出本次响应的验证器，返回需要写回任务记录的字段
+
+        只在本次内容已处理完、随检查状态一起保存时调用；解析或对比出错时不调用，
+        下次仍带旧的验证器请求，不会因为 304 漏掉这次变化。
+        """
+        validators, self._pending_validators = self._pending_validators, None
+        if validators is None or validators == (self.etag, self.last_modified):
+            return {}
+        self.etag, self.last_modified = validators
+        return {'etag': self.etag, 'last_modified': self.last_modified}
+
+    def _save_state(self, **fields):
+        """把监控状态写回任务记录，未关联任务时忽略；同组任务的记录一并更新，便于随时接替"""
+        if self.db and self.task_id:
+            self.db.update_task(self.task_id, **fields)
+            follower_ids = [m.task_id for m in get_check_groups().followers(self) if m.task_id]
+            if follower_ids:
+                if 'last_snapshot' in fields:
+                    fields['snapshot_source'] = self.snapshot_source or self._snapshot_key()
+                self.db.update_tasks(follower_ids, **fields)
+
+    def _fetch(self):
+        """条件请求：带上上次的 ETag/Last-Modified，内容未变化(304)时返回 None
+
+        响应体以流式下载，返回的 StreamedBody 已带有下载时计算的 MD5。
+        """
+        headers = {}
+        self._pending_validators = None
+        # 对比模式下没有基线内容时必须拿到完整响应
+        if self._has_baseline() or not self.compare_mode:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+
+        # 主机熔断期间直接跳过，不占用连接
+        host = urlparse(self.url).hostname or ''
+        host_guard = get_host_guard()
+        host_guard.check(host)
+        # 无论请求以何种方式结束都要记录结果，否则半开状态的探测请求会一直占着主机直到 probe_timeout
+        failure = '请求未完成'
+        try:
+            with self._timed('fetch'):
+                response, body = get_http_client().fetch(self.url, headers=headers)
+            if response.status_code >= 500 or response.status_code == 429:
+                failure = f"状态码 {response.status_code}"
+            else:
+                failure = None
+        except ResponseTooLarge:
+            # 主机正常响应，只是响应体超过上限
+            failure = None
+            raise
+        except Exception as e:
+            failure = str(e)
+            raise
+        finally:
+            if failure is None:
+                host_guard.record_success(host)
+            else:
+                host_guard.record_failure(host, failure)
+                metrics.HOST_ERRORS.inc(host=host)
+        metrics.FETCH_RESPONSES.inc(host=host, status=response.status_code)
+        if body is not None:
+            metrics.FETCH_BYTES.inc(body.size, host=host)
+
+        if response.status_code == 304:
+            self.not_modified_count += 1
+            return None
+        if body is None:
+            raise Exception(f"请求失败，状态码: {response.status_code}")
+
+        self._pending_validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return body
+
+    def _snapshot_key(self):
+        """快照按任务保存；尚未关联任务的监控按 URL 哈希区分"""
+        return self.task_id or self._get_content_hash(self.url)
+
     def _save_snapshot(self, content, timestamp=None):
-        if not timestamp:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}.html"
-        filepath = os.path.join(self.snapshot_dir, filename)
-        
-        os.makedirs(self.snapshot_dir, exist_ok=True)
+        with self._timed('snapshot'):
+            return self.snapshot_store.save(self._snapshot_key(), content, timestamp)
 
-        if isinstance(content, bytes):
-            content = content.decode('utf-8')
-            
-        with open(filepath, 'w', encoding='utf-8', errors='ignore') as f:
-            f.write(content)
-        return filepath
+    def _commit_check(self, current_content, content_hash, **fields):
+        """保存快照，并把本次检查后的状态（含验证器和 fields）一次写回任务记录"""
+        self.last_snapshot = self._save_snapshot(current_content)
+        self.snapshot_source = None
+        self.last_hash = content_hash
+        self._save_state(last_hash=self.last_hash, last_snapshot=self.last_snapshot, snapshot_source=None,
+                         **self._take_validators(), **fields)
 
     def _compare_content(self, old_content, new_content):
         if not old_content:
             return "首次获取，无法比较变化"
         
-        diff_lines = list(difflib.unified_diff(
-            old_content.splitlines(),
-            new_content.splitlines(),
-            lineterm=''
-        ))
-        
+        with self._timed('diff'):
+            diff_lines = processing.run(processing.diff_lines, old_content, new_content)
         diff_text = '\n'.join(diff_lines)
         
         with open("diff.txt", "w", encoding="utf-8") as f:
             f.write(diff_text)
         if diff_lines:
-            try:
-                ai_result = self._get_ai_response(diff_text)
-                return diff_text, ai_result
-            except Exception as e:
-                print(f"AI分析出错: {str(e)}")
-                return diff_text, None
-                
+            return diff_text, self._analyze(diff_text)
+
         return diff_text, None
 
+    def _analyze(self, changes):
+        try:
+            with self._timed('ai'):
+                return self._get_ai_response(changes)
+        except Exception as e:
+            print(f"AI分析出错: {str(e)}")
+            return None
+
+    def _handle_changes(self, changes, ai_result):
+        """根据 AI 分析结果决定是否发送通知，没有可用结果时默认发送"""
+        try:
+            if ai_result:
+                ai_result_dict = json.loads(ai_result)
+                if ai_result_dict.get('skipped') == 'markup_only':
+                    # 只有 HTML 标记变化：配置了 AI 时视为无需 review；未配置 AI 时与其他变化一样直接通知
+                    if ai_configured():
+                        print("变动只涉及 HTML 标记，跳过邮件通知")
+                    else:
+                        print("变动只涉及 HTML 标记，AI 未配置，按默认方式处理...")
+                        self._notify_changes(changes)
+                    return
+                print(f"AI 分析结果:\n{json.dumps(ai_result_dict, indent=2, ensure_ascii=False)}")
+
+                if ai_result_dict.get('review_needed', True):
+                    print("AI 建议需要人工审查，发送通知...")
+                    self._notify_changes(changes, ai_result)
+                else:
+                    print("AI 判断不需要review，跳过邮件通知")
+            else:
+                print("未获得AI分析结果，按默认方式处理...")
+                self._notify_changes(changes)
+        except json.JSONDecodeError as e:
+            print(f"AI返回结果解析失败: {e}，按默认方式处理...")
+            self._notify_changes(changes)
+        except Exception as e:
+            print(f"处理AI分析结果时出错: {e}，按默认方式处理...")
+            self._notify_changes(changes)
+
     def _get_ai_response(self, diff):
-        with open("config/ai_settings.json", "r", encoding="utf-8") as f:
-            ai_settings = json.load(f)
-        print("DBG, ai_settings", ai_settings)
-        ai_client = AiClient(
-            model=ai_settings['model'],
-            diff=diff,
-            base_url=ai_settings['api_url'],
-            api_token=ai_settings['api_token']
-        )
-        print("DBG, ai_client", ai_client)
-        return ai_client.get_response()
+        return get_ai_service().analyze(diff)
 
     def _notify_changes(self, changes, ai_result=None):
+        """把通知交给后台队列发送，不阻塞监控线程；同组任务按各自的收件人设置发送"""
+        for monitor in [self] + get_check_groups().followers(self):
+            monitor._enqueue_notification(changes, ai_result)
+
+    def _enqueue_notification(self, changes, ai_result):
         if self.send_mail and (self.email_addresses or self.cc_addresses):
-            email_sender = EmailSender()
-            
             # 提取网站名称（简单处理，可以进一步优化）
             website_name = self.url.split('//')[-1].split('/')[0]
-            
-            email_sender.send_mail(
+
+            get_notifier().enqueue(Notification(
                 website_name=website_name,
                 url=self.url,
                 changes=changes,
                 ai_result=ai_result,
                 recipients=self.email_addresses,
-                cc_recipients=self.cc_addresses
+                cc_recipients=self.cc_addresses,
+                on_sent=self._record_notification
+            ))
+
+    def _record_notification(self, success):
+        if self.db and self.task_id:
+            self.db.record_notification(
+                self.task_id, self.email_addresses + self.cc_addresses, success
             )
 
 class WebsiteMonitor(BaseMonitor):
+    OPTION_KEYS = BaseMonitor.OPTION_KEYS + (
+        'include_selectors', 'exclude_selectors', 'xpath', 'normalizers', 'parser'
+    )
+    SHARED_STATE_ATTRS = BaseMonitor.SHARED_STATE_ATTRS + ('extracted_hash',)
+
+    def __init__(self, *args, include_selectors=None, exclude_selectors=None, xpath=None,
+                 normalizers=None, parser='html.parser', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.include_selectors = include_selectors or []
+        self.exclude_selectors = exclude_selectors or []
+        self.xpath = xpath
+        self.normalizers = normalizers or []
+        self.parser = parser
+        self.extractor = ContentExtractor(
+            include_selectors=self.include_selectors,
+            exclude_selectors=self.exclude_selectors,
+            xpath=self.xpath,
+            normalizers=self.normalizers,
+            parser=self.parser
+        )
+        self.extracted_hash = None
+
+    def _restore_state(self, task):
+        super()._restore_state(task)
+        self.extracted_hash = task.get('extracted_hash')
+
     def _check_changes(self):
-        response = requests.get(self.url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        current_content = soup.prettify()
-        
+        body = self._fetch()
+        if body is None:
+            return
+        # 响应体超过 spool_size 时落在临时文件中，解析完即释放
+        try:
+            content_hash = body.hash
+            if self._hash_unchanged(content_hash):
+                return
+            with self._timed('parse'):
+                current_content = processing.run(processing.extract_content, self.extractor, body.text)
+        finally:
+            body.close()
+
+        # 原始内容变了但提取、归一化后的区域没变（广告、token 等噪声），跳过对比和快照
+        with self._timed('hash'):
+            extracted_hash = self._get_content_hash(current_content)
+        if extracted_hash == self.extracted_hash and self._has_baseline():
+            self.noise_skip_count += 1
+            self.last_hash = content_hash
+            self._save_state(last_hash=content_hash, **self._take_validators())
+            return
+
         if self.compare_mode:
             if self.last_content:
                 diff_text, ai_result = self._compare_content(self.last_content, current_content)
                 if diff_text:
                     print(f"检测到变化:\n{diff_text}")
-                    
-                    try:
-                        if ai_result:
-                            ai_result_dict = json.loads(ai_result)
-                            print(f"AI 分析结果:\n{json.dumps(ai_result_dict, indent=2, ensure_ascii=False)}")
-                            
-                            if ai_result_dict.get('review_needed', True):
-                                print("AI 建议需要人工审查，发送通知...")
-                                self._notify_changes(diff_text, ai_result)
-                            else:
-                                print("AI 判断不需要review，跳过邮件通知")
-                        else:
-                            print("未获得AI分析结果，按默认方式处理...")
-                            self._notify_changes(diff_text)
-                    except json.JSONDecodeError as e:
-                        print(f"AI返回结果解析失败: {e}，按默认方式处理...")
-                        self._notify_changes(diff_text)
-                    except Exception as e:
-                        print(f"处理AI分析结果时出错: {e}，按默认方式处理...")
-                        self._notify_changes(diff_text)
+                    self._handle_changes(diff_text, ai_result)
             
             self.last_content = current_content
-        
-        self._save_snapshot(current_content)
 
-class RSSMonitor(BaseMonitor):
+        self.extracted_hash = extracted_hash
+        self._commit_check(current_content, content_hash, extracted_hash=extracted_hash)
+
+class FeedMonitor(BaseMonitor):
+    """订阅类监控的基类
+
+    按条目标识 (id/link/guid) 和条目内容哈希跟踪已见条目，每次只把新增、更新、
+    移除的条目交给 AI 分析和邮件通知，而不是对整个订阅做行级对比。
+    """
+    label = '订阅'
+    SHARED_STATE_ATTRS = BaseMonitor.SHARED_STATE_ATTRS + ('seen_entries', 'feed_keys')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 条目标识 -> 条目内容哈希，按最近出现的顺序排列，最多 FEED_SEEN_LIMIT 条
+        self.seen_entries = OrderedDict()
+        self.feed_keys = []
+
+    def _restore_state(self, task):
+        super()._restore_state(task)
+        self.seen_entries = OrderedDict(task.get('seen_entries') or [])
+        self.feed_keys = task.get('feed_keys') or []
+
+    def _has_baseline(self):
+        return bool(self.seen_entries)
+
+    def _parse_feed(self, body):
+        with self._timed('parse'):
+            return processing.run(processing.parse_feed_entries, body.content)
+
+    def _entry_key(self, entry, entry_hash):
+        return entry.get('id') or entry.get('link') or entry.get('guid') or entry_hash
+
+    def _diff_entries(self, entries):
+        """返回 (新增条目, 更新条目, 移除的条目标识)"""
+        new_entries = []
+        updated_entries = []
+        keys = []
+        for entry in entries:
+            entry_hash = self._get_content_hash(
+                json.dumps(entry, sort_keys=True, ensure_ascii=False, default=str)
+            )
+            key = self._entry_key(entry, entry_hash)
+            keys.append(key)
+            previous_hash = self.seen_entries.get(key)
+            if previous_hash is None:
+                new_entries.append(entry)
+            elif previous_hash != entry_hash:
+                updated_entries.append(entry)
+            self.seen_entries[key] = entry_hash
+            self.seen_entries.move_to_end(key)
+
+        while len(self.seen_entries) > FEED_SEEN_LIMIT:
+            self.seen_entries.popitem(last=False)
+        current_keys = set(keys)
+        removed_keys = [key for key in self.feed_keys if key not in current_keys]
+        self.feed_keys = keys
+        return new_entries, updated_entries, removed_keys
+
+    def _format_entry_changes(self, new_entries, updated_entries, removed_keys):
+        sections = []
+        if new_entries:
+            sections.append(f"新增条目 ({len(new_entries)}):\n"
+                            + json.dumps(new_entries, indent=2, ensure_ascii=False, default=str))
+        if updated_entries:
+            sections.append(f"更新条目 ({len(updated_entries)}):\n"
+                            + json.dumps(updated_entries, indent=2, ensure_ascii=False, default=str))
+        if removed_keys:
+            sections.append(f"移除条目 ({len(removed_keys)}):\n"
+                            + '\n'.join(f"- {key}" for key in removed_keys))
+        return '\n\n'.join(sections)
+
     def _check_changes(self):
-        feed = feedparser.parse(self.url)
-        current_content = json.dumps(feed.entries, indent=2, ensure_ascii=False)
-        
+        body = self._fetch()
+        if body is None:
+            return
+        try:
+            content_hash = body.hash
+            if self._hash_unchanged(content_hash):
+                return
+            entries = self._parse_feed(body)
+        finally:
+            body.close()
+        current_content = json.dumps(entries, indent=2, ensure_ascii=False)
+
         if self.compare_mode:
-            if self.last_content:
-                changes = self._compare_content(self.last_content, current_content)
-                if changes:
-                    print(f"检测到RSS更新:\n{changes}")
-                    self._notify_changes(changes)
-            
-            self.last_content = current_content
-        
-        self._save_snapshot(current_content)
+            first_fetch = not self.seen_entries
+            with self._timed('diff'):
+                new_entries, updated_entries, removed_keys = self._diff_entries(entries)
+            # 只有条目移除通常是订阅截断了旧条目，不单独触发通知
+            if not first_fetch and (new_entries or updated_entries):
+                changes = self._format_entry_changes(new_entries, updated_entries, removed_keys)
+                print(f"检测到{self.label}更新:\n{changes}")
+                self._handle_changes(changes, self._analyze(changes))
 
-class GitHubMonitor(BaseMonitor):
-    def _check_changes(self):
-        # 添加releases.atom后缀
-        if not self.url.endswith('/releases.atom'):
-            self.url = f"{self.url.rstrip('/')}/releases.atom"
-        
-        response = requests.get(self.url)
-        feed = feedparser.parse(response.text)
-        current_content = json.dumps(feed.entries, indent=2, ensure_ascii=False)
-        
+        self._commit_check(current_content, content_hash)
+
+    def _commit_check(self, current_content, content_hash, **fields):
         if self.compare_mode:
-            if self.last_content:
-                changes = self._compare_content(self.last_content, current_content)
-                if changes:
-                    print(f"检测到GitHub更新:\n{changes}")
-                    self._notify_changes(changes)
-            
-            self.last_content = current_content
-        
-        self._save_snapshot(current_content)
\ No newline at end of file
+            fields.update(seen_entries=list(self.seen_entries.items()), feed_keys=self.feed_keys)
+        super()._commit_check(current_content, content_hash, **fields)
+
+class RSSMonitor(FeedMonitor):
+    label = 'RSS'
+
+class GitHubMonitor(FeedMonitor):
+    label = 'GitHub'
+
+    @staticmethod
+    def _feed_url(url):
+        # 添加releases.atom后缀
+        if not url.endswith('/releases.atom'):
+            return f"{url.rstrip('/')}/releases.atom"
+        return url
+
+    @classmethod
+    def share_url(cls, url):
+        return canonical_url(cls._feed_url(url))
+
+    def _fetch(self):
+        self.url = self._feed_url(self.url)
+        return super()._fetch()
+
+
+class CheckGroup:
+    def __init__(self):
+        self.leader = None
+        self.followers = []
+
+
+class CheckGroups:
+    """按共享键合并监控同一地址、使用相同提取配置的任务
+
+    每组只有一个任务（leader）注册在调度器上执行抓取、解析、对比和 AI 分析，检查结果和
+    变化通知分发给组内每个任务，按各自的收件人设置发送。leader 暂停或删除时由组内下一个
+    任务接替，沿用其状态并在原定时间继续检查。
+    """
+
+    def __init__(self):
+        self._groups = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def join(self, monitor, delay=0):
+        key = monitor.share_key()
+        with self._lock:
+            group = self._groups.setdefault(key, CheckGroup())
+            self._keys[monitor] = key
+            if group.leader is not None:
+                group.followers.append(monitor)
+                return
+            group.leader = monitor
+        monitor.scheduler.add(monitor, delay=delay)
+
+    def leave(self, monitor):
+        with self._lock:
+            key = self._keys.pop(monitor, None)
+            group = self._groups.get(key)
+            if group is None:
+                successor = None
+            elif group.leader is monitor:
+                successor = group.followers.pop(0) if group.followers else None
+                group.leader = successor
+                if successor is None:
+                    del self._groups[key]
+            else:
+                if monitor in group.followers:
+                    group.followers.remove(monitor)
+                return
+        if monitor.scheduler:
+            monitor.scheduler.remove(monitor)
+        if successor is not None:
+            successor.inherit_state(monitor)
+            delay = max(monitor.next_due - time.time(), 0) if monitor.next_due else 0
+            successor.scheduler.add(successor, delay=delay)
+
+    def leader_of(self, monitor):
+        with self._lock:
+            group = self._groups.get(self._keys.get(monitor))
+            return group.leader if group else None
+
+    def followers(self, monitor):
+        """返回由 monitor 代为检查的同组任务，monitor 不是 leader 时返回空列表"""
+        with self._lock:
+            group = self._groups.get(self._keys.get(monitor))
+            if group is None or group.leader is not monitor:
+                return []
+            return list(group.followers)
+
+
+_check_groups = None
+_check_groups_lock = threading.Lock()
+
+
+def get_check_groups():
+    """返回进程内共享的任务分组"""
+    global _check_groups
+    with _check_groups_lock:
+        if _check_groups is None:
+            _check_groups = CheckGroups()
+        return _check_groups
+
+
+def start_restored(monitors, stagger):
+    """启动从任务记录重建的监控：按持久化的下次检查时间排期，逾期任务在 stagger 秒内均匀错开"""
+    now = time.time()
+    overdue = []
+    for monitor in monitors:
+        if monitor.next_due and monitor.next_due > now:
+            monitor.start(delay=monitor.next_due - now)
+        else:
+            overdue.append(monitor)
+    for i, monitor in enumerate(overdue):
+        monitor.start(delay=stagger * i / len(overdue))
+
+MONITOR_TYPES = {
+    'website': WebsiteMonitor,
+    'rss': RSSMonitor,
+    'github': GitHubMonitor,
+}
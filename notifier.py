@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import threading
+import time
+from config_cache import load_settings
+from email_sender import EmailSender
+import metrics
+
+DEFAULT_NOTIFICATION_SETTINGS = {
+    # 把同一组收件人在窗口期内的多次变化合并为一封邮件
+    'digest': False,
+    'digest_window': 600,
+    # 发送失败后的重试次数和首次重试等待秒数（之后每次翻倍）
+    'max_retries': 3,
+    'retry_backoff': 30,
+}
+
+
+class Notification:
+    def __init__(self, website_name, url, changes, ai_result, recipients, cc_recipients, on_sent=None):
+        self.website_name = website_name
+        self.url = url
+        self.changes = changes
+        self.ai_result = ai_result
+        self.recipients = list(recipients)
+        self.cc_recipients = list(cc_recipients or [])
+        self.on_sent = on_sent
+
+    @property
+    def recipient_key(self):
+        return tuple(sorted(self.recipients)), tuple(sorted(self.cc_recipients))
+
+
+class NotificationQueue:
+    """后台邮件通知队列
+
+    监控线程只负责入队；单个后台线程复用同一个 EmailSender（SMTP 连接保持打开）发送，
+    失败时按指数退避重试。开启 digest 后，同一组收件人在 digest_window 秒内的变化合并为一封邮件。
+    """
+
+    def __init__(self, digest=False, digest_window=600, max_retries=3, retry_backoff=30):
+        self.digest = digest
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._heap = []
+        self._counter = itertools.count()
+        self._digests = {}
+        self._condition = threading.Condition()
+        self._sender = None
+        self._thread = None
+        self._stopping = False
+        self.sent_count = 0
+        self.failed_count = 0
+
+    def start(self):
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._worker, name='notification-queue')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        """停止后台线程，不再发送或重试队列中的通知"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+        self.reload()
+
+    def reload(self):
+        """邮件设置或模板修改后，下次发送时重新创建 EmailSender"""
+        with self._condition:
+            sender, self._sender = self._sender, None
+        if sender:
+            sender.close()
+
+    def enqueue(self, notification):
+        self.start()
+        with self._condition:
+            if self.digest:
+                key = notification.recipient_key
+                if key not in self._digests:
+                    self._digests[key] = []
+                    self._push(time.time() + self.digest_window, ('digest', key, 0))
+                self._digests[key].append(notification)
+            else:
+                self._push(time.time(), ('single', [notification], 0))
+            self._condition.notify()
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _push(self, ready_at, job):
+        heapq.heappush(self._heap, (ready_at, next(self._counter), job))
+
+    def _next_job(self):
+        with self._condition:
+            while not self._stopping:
+                if self._heap:
+                    ready_at = self._heap[0][0]
+                    wait = ready_at - time.time()
+                    if wait <= 0:
+                        return heapq.heappop(self._heap)[2]
+                    self._condition.wait(wait)
+                else:
+                    self._condition.wait()
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            kind, payload, attempt = job
+            if kind == 'digest':
+                with self._condition:
+                    notifications = self._digests.pop(payload, [])
+            else:
+                notifications = payload
+            if not notifications:
+                continue
+
+            try:
+                with metrics.timed('email'):
+                    success = self._send(notifications)
+            except Exception as e:
+                print(f"发送通知出错: {e}")
+                success = False
+
+            if not success and attempt < self.max_retries:
+                delay = self.retry_backoff * 2 ** attempt
+                print(f"邮件发送失败，{delay} 秒后重试 ({attempt + 1}/{self.max_retries})")
+                with self._condition:
+                    self._push(time.time() + delay, ('single', notifications, attempt + 1))
+                continue
+
+            if success:
+                self.sent_count += 1
+            else:
+                self.failed_count += 1
+            for notification in notifications:
+                if notification.on_sent:
+                    try:
+                        notification.on_sent(success)
+                    except Exception as e:
+                        print(f"记录通知结果出错: {e}")
+
+    def _get_sender(self):
+        with self._condition:
+            if self._sender is None:
+                self._sender = EmailSender()
+            return self._sender
+
+    def _send(self, notifications):
+        sender = self._get_sender()
+        first = notifications[0]
+        if len(notifications) == 1:
+            return sender.send_mail(
+                website_name=first.website_name,
+                url=first.url,
+                changes=first.changes,
+                ai_result=first.ai_result,
+                recipients=first.recipients,
+                cc_recipients=first.cc_recipients
+            )
+
+        bodies = []
+        for notification in notifications:
+            _, content = sender.render(
+                website_name=notification.website_name,
+                url=notification.url,
+                changes=notification.changes,
+                ai_result=notification.ai_result
+            )
+            bodies.append(content.strip())
+        subject = f"[网站更新汇总] {len(notifications)} 项变化"
+        content = f"\n\n{'=' * 40}\n\n".join(bodies)
+        return sender.send_mail(
+            subject=subject,
+            content=content,
+            recipients=first.recipients,
+            cc_recipients=first.cc_recipients
+        )
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """返回进程内共享的通知队列，配置读取自 config/notification_settings.json"""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            settings = load_settings('config/notification_settings.json', DEFAULT_NOTIFICATION_SETTINGS)
+            _notifier = NotificationQueue(
+                digest=bool(settings['digest']),
+                digest_window=float(settings['digest_window']),
+                max_retries=int(settings['max_retries']),
+                retry_backoff=float(settings['retry_backoff'])
+            )
+        return _notifier
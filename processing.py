@@ -0,0 +1,115 @@
+import difflib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import feedparser
+from config_cache import load_settings
+
+DEFAULT_PROCESSING_SETTINGS = {
+    # 是否把解析、归一化和对比放到进程池中执行
+    'process_pool': False,
+    # 进程数，None 表示 CPU 核数
+    'process_workers': None,
+}
+
+# 行级对比时保留的上下文行数，以及交给 difflib 的变化区域最大行数
+DIFF_CONTEXT = 3
+DIFF_MAX_LINES = 20000
+# 对比区域截取后修正 hunk 头中的起始行号
+HUNK_HEADER = re.compile(r'([-+])(\d+)')
+
+
+_pool = None
+_pool_loaded = False
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_loaded
+    with _pool_lock:
+        if not _pool_loaded:
+            settings = load_settings('config/processing_settings.json', DEFAULT_PROCESSING_SETTINGS)
+            if settings['process_pool']:
+                workers = settings['process_workers'] or os.cpu_count()
+                # 进程池在监控线程中按需创建，此时调度器、线程池和数据库连接都已在运行；
+                # fork 多线程进程可能死锁，统一使用 spawn（Windows 打包版本本来就是 spawn）
+                _pool = ProcessPoolExecutor(
+                    max_workers=int(workers),
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            _pool_loaded = True
+        return _pool
+
+
+def _reset_pool():
+    global _pool, _pool_loaded
+    with _pool_lock:
+        if _pool:
+            _pool.shutdown(wait=False)
+        _pool = None
+        _pool_loaded = False
+
+
+def run(func, *args):
+    """执行 CPU 密集的处理步骤
+
+    启用进程池时提交到进程池并在当前工作线程中等待结果，抓取仍留在线程中完成；
+    未启用或进程池异常时直接在当前线程执行。func 必须是本模块的顶层函数。
+    """
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        print("进程池异常，重建后本次在线程中执行")
+        _reset_pool()
+        return func(*args)
+
+
+def extract_content(extractor, text):
+    return extractor.extract(text)
+
+
+def parse_feed_entries(content):
+    return feedparser.parse(content).entries
+
+
+def diff_lines(old_content, new_content):
+    """有界内存的行级对比：先去掉相同的首尾行，只对中间变化的区域运行 difflib"""
+    if old_content == new_content:
+        return []
+    old_lines = old_content.splitlines()
+    new_lines = new_content.splitlines()
+
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    start = max(prefix - DIFF_CONTEXT, 0)
+    keep_suffix = max(suffix - DIFF_CONTEXT, 0)
+    old_middle = old_lines[start:len(old_lines) - keep_suffix]
+    new_middle = new_lines[start:len(new_lines) - keep_suffix]
+    del old_lines, new_lines
+
+    truncated = len(old_middle) > DIFF_MAX_LINES or len(new_middle) > DIFF_MAX_LINES
+    if truncated:
+        old_middle = old_middle[:DIFF_MAX_LINES]
+        new_middle = new_middle[:DIFF_MAX_LINES]
+
+    lines = []
+    for line in difflib.unified_diff(old_middle, new_middle, lineterm=''):
+        if start and line.startswith('@@'):
+            line = HUNK_HEADER.sub(lambda m: f"{m.group(1)}{int(m.group(2)) + start}", line)
+        lines.append(line)
+    if truncated:
+        lines.append(f"... 变化区域超过 {DIFF_MAX_LINES} 行，只对比了前 {DIFF_MAX_LINES} 行")
+    return lines
@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from config_cache import load_settings
+from host_guard import get_host_guard
+import metrics
+
+DEFAULT_MAX_CONCURRENCY = 32
+
+DEFAULT_SCHEDULER_SETTINGS = {
+    'max_concurrency': DEFAULT_MAX_CONCURRENCY,
+    # fixed_rate: 按计划时间等间隔执行，不受检查耗时影响；fixed_delay: 上次检查结束后再等一个间隔
+    'timing': 'fixed_rate',
+    # 每次执行时间的随机偏移，占检查间隔的比例
+    'jitter': 0.0,
+    # 按任务哈希把相同间隔的任务均匀分布在间隔窗口内
+    'spread': True,
+}
+
+
+class MonitorScheduler:
+    """所有监控任务共享的调度器
+
+    用一个按到期时间排序的堆代替每个任务一个线程：单个 asyncio 事件循环在后台线程中运行，
+    到期的任务交给容量为 max_concurrency 的线程池执行检查，因此任务数量增加时线程数保持不变。
+
+    堆中每项为 (执行时间, 序号, 监控实例, 计划时间, 是否已预留主机时段)。计划时间按固定频率推进，
+    抖动只影响执行时间，不会累积；配置 host_guard 时同一主机的请求按其令牌桶限速。
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, timing='fixed_rate',
+                 jitter=0.0, spread=True, host_guard=None):
+        self.max_concurrency = max_concurrency
+        self.timing = timing
+        self.jitter = jitter
+        self.spread = spread
+        self.host_guard = host_guard
+        self._heap = []
+        self._entries = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._wakeup = None
+        self._semaphore = None
+        self._executor = None
+        self._ready = threading.Event()
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._ready.clear()
+            self._stopping = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix='monitor-worker'
+            )
+            self._thread = threading.Thread(target=self._run_loop, name='monitor-scheduler')
+            self._thread.daemon = True
+            self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        loop = self._loop
+        if loop and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop)
+        if self._thread:
+            self._thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        self._thread = None
+        self._loop = None
+
+    def add(self, monitor, delay=0):
+        """注册监控任务，delay 秒后执行第一次检查"""
+        self.start()
+        due = time.time() + delay
+        with self._lock:
+            token = next(self._counter)
+            self._entries[monitor] = token
+            heapq.heappush(self._heap, (due, token, monitor, due, False))
+        self._notify()
+
+    def remove(self, monitor):
+        """注销监控任务，堆中残留的条目在出堆时被丢弃"""
+        with self._lock:
+            self._entries.pop(monitor, None)
+        self._notify()
+
+    def is_scheduled(self, monitor):
+        with self._lock:
+            return monitor in self._entries
+
+    def task_count(self):
+        with self._lock:
+            return len(self._entries)
+
+    def queue_depth(self):
+        """堆中等待执行的条目数（含已注销、尚未出堆的条目）"""
+        with self._lock:
+            return len(self._heap)
+
+    def _notify(self):
+        loop = self._loop
+        if loop and loop.is_running():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _phase(self, monitor, period):
+        key = monitor.task_id or monitor.url
+        return zlib.crc32(key.encode('utf-8')) / 2 ** 32 * period
+
+    def _next_due(self, monitor, planned):
+        """计算下一次的计划时间"""
+        period = monitor.period()
+        now = time.time()
+        if self.timing == 'fixed_delay':
+            return now + period
+
+        due = planned + period
+        if self.spread and period > 0:
+            # 对齐到该任务在间隔窗口内的固定相位
+            phase = self._phase(monitor, period)
+            due = phase + round((due - phase) / period) * period
+        if due <= now and period > 0:
+            # 错过的周期直接跳过，不补跑
+            due += math.ceil((now - due) / period) * period
+        return due
+
+    def _with_jitter(self, monitor, due):
+        if not self.jitter:
+            return due
+        offset = random.uniform(-self.jitter, self.jitter) * monitor.period()
+        return max(time.time(), due + offset)
+
+    def _reschedule(self, monitor, token, planned):
+        """把任务按下一次的执行时间放回堆中，返回该时间；任务已注销时返回 None"""
+        due = self._next_due(monitor, planned)
+        dispatch_at = self._with_jitter(monitor, due)
+        with self._lock:
+            if self._entries.get(monitor) != token:
+                return None
+            token = next(self._counter)
+            self._entries[monitor] = token
+            heapq.heappush(self._heap, (dispatch_at, token, monitor, due, False))
+        return dispatch_at
+
+    def _host_slot(self, monitor, now):
+        """返回该主机可用的最早执行时间，并为本次请求预留令牌"""
+        if self.host_guard is None:
+            return now
+        return self.host_guard.reserve(urlparse(monitor.url).hostname or '', now)
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                dispatch_at, token, monitor, planned, reserved = heapq.heappop(self._heap)
+                if self._entries.get(monitor) != token:
+                    continue
+                if not reserved:
+                    slot = self._host_slot(monitor, now)
+                    if slot > now:
+                        heapq.heappush(self._heap, (slot, token, monitor, planned, True))
+                        continue
+                due.append((monitor, token, planned, dispatch_at))
+            next_due = self._heap[0][0] if self._heap else None
+        return due, next_due
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._loop.create_task(self._dispatch_loop())
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _dispatch_loop(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            due, next_due = self._pop_due(time.time())
+            for monitor, token, planned, dispatch_at in due:
+                asyncio.ensure_future(self._run_check(monitor, token, planned, dispatch_at))
+            timeout = None if next_due is None else max(0, next_due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _shutdown(self):
+        # wait_for 可能吞掉取消请求（Python 3.11），先用标志让分发循环自行退出
+        self._stopping = True
+        self._wakeup.set()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop.stop()
+
+    async def _run_check(self, monitor, token, planned, dispatch_at):
+        try:
+            async with self._semaphore:
+                await self._loop.run_in_executor(self._executor, self._execute, monitor, dispatch_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"执行检查出错 {monitor.url}: {e}")
+        finally:
+            # 检查出错也要放回堆中，否则任务留在 _entries 中却再也不会执行
+            if not self._stopping:
+                next_dispatch = self._reschedule(monitor, token, planned)
+                if next_dispatch is not None:
+                    # 写任务库可能要等待其他进程释放写锁，放到线程池中执行，不阻塞分发循环
+                    self._executor.submit(self._save_next_due, monitor, next_dispatch)
+                self._wakeup.set()
+
+    @staticmethod
+    def _execute(monitor, dispatch_at):
+        # 调度延迟：应执行时间到工作线程真正开始检查的时间
+        metrics.SCHEDULER_LAG.observe(max(0, time.time() - dispatch_at))
+        monitor.run_check()
+
+    @staticmethod
+    def _save_next_due(monitor, next_due):
+        try:
+            monitor.set_next_due(next_due)
+        except Exception as e:
+            print(f"保存下次检查时间失败: {e}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """返回进程内共享的调度器，配置读取自 config/scheduler_settings.json"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            settings = load_settings('config/scheduler_settings.json', DEFAULT_SCHEDULER_SETTINGS)
+            _scheduler = MonitorScheduler(
+                max_concurrency=int(settings['max_concurrency']),
+                timing=settings['timing'],
+                jitter=float(settings['jitter']),
+                spread=bool(settings['spread']),
+                host_guard=get_host_guard()
+            )
+        return _scheduler
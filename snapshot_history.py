@@ -0,0 +1,185 @@
+import difflib
+import gzip
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+
+# 索引记录: 数据偏移, 数据长度, 保存时间, sha256
+_RECORD = struct.Struct('<QId32s')
+
+
+class DeltaHistory:
+    """关键帧 + 行级增量的快照历史
+
+    每个任务一个目录:
+        meta.json   起始版本号和关键帧间隔
+        index.bin   定长索引记录，按版本号直接定位
+        data.bin    gzip 压缩的关键帧全文或增量
+
+    版本号能被 keyframe_interval 整除时保存全文，其余保存相对上一版本的增量，
+    因此还原任意版本最多读取 keyframe_interval 条记录。
+    """
+
+    def __init__(self, path, keyframe_interval=20):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self._lock = threading.Lock()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.path, 'index.bin')
+
+    @property
+    def _data_path(self):
+        return os.path.join(self.path, 'data.bin')
+
+    def _load_meta(self):
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'base': 0, 'keyframe_interval': self.keyframe_interval}
+
+    def _save_meta(self, meta):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _record_count(self):
+        if not os.path.exists(self._index_path):
+            return 0
+        return os.path.getsize(self._index_path) // _RECORD.size
+
+    def _read_record(self, meta, version):
+        with open(self._index_path, 'rb') as f:
+            f.seek((version - meta['base']) * _RECORD.size)
+            offset, length, saved_at, digest = _RECORD.unpack(f.read(_RECORD.size))
+        return offset, length, saved_at, digest.hex()
+
+    def _read_payload(self, offset, length):
+        with open(self._data_path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)).decode('utf-8'))
+
+    def version_range(self):
+        """返回 (最早版本, 下一个版本号)，没有历史时两者相等"""
+        with self._lock:
+            meta = self._load_meta()
+            return meta['base'], meta['base'] + self._record_count()
+
+    def latest_hash(self):
+        with self._lock:
+            meta = self._load_meta()
+            count = self._record_count()
+            if not count:
+                return None
+            return self._read_record(meta, meta['base'] + count - 1)[3]
+
+    def append(self, content, timestamp=None):
+        """追加一个新版本，返回版本号"""
+        with self._lock:
+            meta = self._load_meta()
+            version = meta['base'] + self._record_count()
+            lines = content.splitlines(keepends=True)
+            if version % meta['keyframe_interval'] == 0:
+                payload = {'key': lines}
+            else:
+                previous = self._reconstruct(meta, version - 1)
+                payload = {'delta': self._make_delta(previous, lines)}
+
+            data = gzip.compress(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+            os.makedirs(self.path, exist_ok=True)
+            if not os.path.exists(self._meta_path):
+                self._save_meta(meta)
+            with open(self._data_path, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            digest = hashlib.sha256(content.encode('utf-8')).digest()
+            with open(self._index_path, 'ab') as f:
+                f.write(_RECORD.pack(offset, len(data), timestamp or time.time(), digest))
+            return version
+
+    def reconstruct(self, version):
+        """还原指定版本的全文"""
+        with self._lock:
+            meta = self._load_meta()
+            if not meta['base'] <= version < meta['base'] + self._record_count():
+                raise KeyError(f"版本 {version} 不存在")
+            return ''.join(self._reconstruct(meta, version))
+
+    def find_version(self, content_hash):
+        """按内容哈希查找最近的版本号，找不到返回 None"""
+        with self._lock:
+            meta = self._load_meta()
+            for version in range(meta['base'] + self._record_count() - 1, meta['base'] - 1, -1):
+                if self._read_record(meta, version)[3] == content_hash:
+                    return version
+        return None
+
+    def _reconstruct(self, meta, version):
+        keyframe = version - version % meta['keyframe_interval']
+        lines = None
+        for v in range(max(keyframe, meta['base']), version + 1):
+            offset, length, _, _ = self._read_record(meta, v)
+            payload = self._read_payload(offset, length)
+            if 'key' in payload:
+                lines = payload['key']
+            else:
+                lines = self._apply_delta(lines, payload['delta'])
+        return lines
+
+    @staticmethod
+    def _make_delta(old_lines, new_lines):
+        """用 difflib 生成行级增量：[i1, i2] 复制旧版本的行，字符串列表为新增行"""
+        ops = []
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ops.append([i1, i2])
+            elif j2 > j1:
+                ops.append(new_lines[j1:j2])
+        return ops
+
+    @staticmethod
+    def _apply_delta(old_lines, ops):
+        lines = []
+        for op in ops:
+            if op and isinstance(op[0], int):
+                lines.extend(old_lines[op[0]:op[1]])
+            else:
+                lines.extend(op)
+        return lines
+
+    def compact(self, min_version):
+        """丢弃 min_version 所在关键帧之前的所有版本"""
+        with self._lock:
+            meta = self._load_meta()
+            count = self._record_count()
+            new_base = min_version - min_version % meta['keyframe_interval']
+            new_base = min(new_base, meta['base'] + count)
+            if new_base <= meta['base']:
+                return
+
+            records = [self._read_record(meta, v) for v in range(new_base, meta['base'] + count)]
+            tmp_data = f"{self._data_path}.tmp"
+            tmp_index = f"{self._index_path}.tmp"
+            with open(self._data_path, 'rb') as src, \
+                    open(tmp_data, 'wb') as data_out, \
+                    open(tmp_index, 'wb') as index_out:
+                for offset, length, saved_at, digest in records:
+                    src.seek(offset)
+                    new_offset = data_out.tell()
+                    data_out.write(src.read(length))
+                    index_out.write(_RECORD.pack(new_offset, length, saved_at, bytes.fromhex(digest)))
+            os.replace(tmp_data, self._data_path)
+            os.replace(tmp_index, self._index_path)
+            meta['base'] = new_base
+            self._save_meta(meta)
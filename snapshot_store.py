@@ -0,0 +1,172 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from config_cache import load_settings
+from snapshot_history import DeltaHistory
+
+DEFAULT_SNAPSHOT_SETTINGS = {
+    'root': 'website_snapshots',
+    # objects: 每个不同内容一份压缩全文；delta: 关键帧 + 行级增量历史
+    'format': 'objects',
+    'keyframe_interval': 20,
+    # 每个任务最多保留的快照记录数，None 表示不限制
+    'keep_last': 500,
+    # 快照记录最长保留天数，None 表示不限制
+    'keep_days': None,
+}
+
+
+class SnapshotStore:
+    """按任务划分、按内容哈希去重的压缩快照存储
+
+    目录结构:
+        <root>/<task_key>/index.jsonl               每次保存追加一行元数据
+        <root>/<task_key>/objects/<hh>/<hash>.gz    objects 格式：每个不同内容只保存一份
+        <root>/<task_key>/history/                  delta 格式：见 DeltaHistory
+    """
+
+    def __init__(self, root='website_snapshots', keep_last=None, keep_days=None,
+                 format='objects', keyframe_interval=20):
+        self.root = root
+        self.keep_last = keep_last
+        self.keep_days = keep_days
+        self.format = format
+        self.keyframe_interval = keyframe_interval
+        self._lock = threading.Lock()
+
+    def _task_dir(self, task_key):
+        return os.path.join(self.root, task_key)
+
+    def _index_path(self, task_key):
+        return os.path.join(self._task_dir(task_key), 'index.jsonl')
+
+    def _object_path(self, task_key, content_hash):
+        return os.path.join(self._task_dir(task_key), 'objects', content_hash[:2], f"{content_hash}.gz")
+
+    def history(self, task_key):
+        return DeltaHistory(os.path.join(self._task_dir(task_key), 'history'), self.keyframe_interval)
+
+    def save(self, task_key, content, timestamp=None, **metadata):
+        """保存一次快照，返回内容哈希；相同内容只写入索引不重复存储"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        content_hash = hashlib.sha256(content).hexdigest()
+        entry = {
+            'time': timestamp or time.time(),
+            'hash': content_hash,
+            'size': len(content),
+        }
+        entry.update(metadata)
+
+        with self._lock:
+            if self.format == 'delta':
+                history = self.history(task_key)
+                if history.latest_hash() == content_hash:
+                    entry['version'] = history.version_range()[1] - 1
+                else:
+                    entry['version'] = history.append(content.decode('utf-8', errors='ignore'), entry['time'])
+            else:
+                object_path = self._object_path(task_key, content_hash)
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    tmp_path = f"{object_path}.tmp"
+                    with gzip.open(tmp_path, 'wb') as f:
+                        f.write(content)
+                    os.replace(tmp_path, object_path)
+
+            os.makedirs(self._task_dir(task_key), exist_ok=True)
+            with open(self._index_path(task_key), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+            self._apply_retention(task_key)
+        return content_hash
+
+    def load(self, task_key, content_hash):
+        """按内容哈希读取快照内容"""
+        if self.format == 'delta':
+            history = self.history(task_key)
+            version = history.find_version(content_hash)
+            if version is None:
+                raise KeyError(f"快照 {content_hash} 不存在")
+            return history.reconstruct(version)
+        with gzip.open(self._object_path(task_key, content_hash), 'rb') as f:
+            return f.read().decode('utf-8', errors='ignore')
+
+    def load_version(self, task_key, version):
+        """delta 格式下按版本号还原快照内容"""
+        return self.history(task_key).reconstruct(version)
+
+    def list_snapshots(self, task_key):
+        """按时间顺序返回任务的快照元数据"""
+        with self._lock:
+            return self._read_index(task_key)
+
+    def _read_index(self, task_key):
+        index_path = self._index_path(task_key)
+        if not os.path.exists(index_path):
+            return []
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def apply_retention(self, task_key):
+        with self._lock:
+            self._apply_retention(task_key)
+
+    def _apply_retention(self, task_key):
+        entries = self._read_index(task_key)
+        kept = entries
+        if self.keep_days:
+            cutoff = time.time() - float(self.keep_days) * 86400
+            kept = [e for e in kept if e['time'] >= cutoff]
+        if self.keep_last and len(kept) > int(self.keep_last):
+            kept = kept[-int(self.keep_last):]
+        if len(kept) == len(entries):
+            return
+
+        index_path = self._index_path(task_key)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in kept:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, index_path)
+
+        if self.format == 'delta':
+            if kept:
+                self.history(task_key).compact(min(e['version'] for e in kept))
+            return
+
+        # 删除不再被索引引用的内容对象
+        referenced = {e['hash'] for e in kept}
+        for entry in entries:
+            if entry['hash'] not in referenced:
+                object_path = self._object_path(task_key, entry['hash'])
+                if os.path.exists(object_path):
+                    os.remove(object_path)
+                    try:
+                        os.rmdir(os.path.dirname(object_path))
+                    except OSError:
+                        pass
+                referenced.add(entry['hash'])
+
+
+_snapshot_store = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store():
+    """返回进程内共享的快照存储，保留策略读取自 config/snapshot_settings.json"""
+    global _snapshot_store
+    with _snapshot_store_lock:
+        if _snapshot_store is None:
+            settings = load_settings('config/snapshot_settings.json', DEFAULT_SNAPSHOT_SETTINGS)
+            _snapshot_store = SnapshotStore(
+                root=settings['root'],
+                keep_last=settings['keep_last'],
+                keep_days=settings['keep_days'],
+                format=settings['format'],
+                keyframe_interval=int(settings['keyframe_interval'])
+            )
+        return _snapshot_store
@@ -14,6 +14,11 @@ function handleModeChange() {
     
     // 显示选中的输入框
     document.getElementById(`${mode}_input`).style.display = 'flex';
+
+    // 区域选择和噪声过滤只对网站模式有效
+    ['website_filter', 'website_exclude', 'website_normalizers'].forEach(id => {
+        document.getElementById(id).style.display = mode === 'website' ? 'flex' : 'none';
+    });
 }
 
 // 标签页切换
@@ -29,6 +29,12 @@ function addTask() {
         mode: mode,
         url: url,
         interval: document.getElementById('time').value,
+        adaptive: document.getElementById('adaptive_interval').checked,
+        minInterval: document.getElementById('min_interval').value,
+        maxInterval: document.getElementById('max_interval').value,
+        includeSelectors: splitList(document.getElementById('include_selectors').value, ','),
+        excludeSelectors: splitList(document.getElementById('exclude_selectors').value, ','),
+        normalizers: splitList(document.getElementById('normalizers').value, '\n'),
         compareMode: document.querySelector('input[name="compare_mode"]:checked')?.value === '1',
         sendMail: document.querySelector('input[name="send_mail"]:checked')?.value === '1',
         emailAddresses: getEmailAddresses(),
@@ -49,8 +55,7 @@ function addTask() {
             alert('添加任务失败：' + data.error);
         } else {
             alert('任务添加成功！');
-            // 刷新页面以显示新任务
-            location.reload();
+            loadTasks(taskPage);
         }
     })
     .catch(error => {
@@ -59,6 +64,220 @@ function addTask() {
     });
 }
 
+// 任务列表当前页码和每页数量
+let taskPage = 1;
+const TASK_PAGE_SIZE = 50;
+let taskTotal = 0;
+
+// 按筛选条件分页加载任务列表
+function loadTasks(page) {
+    const params = new URLSearchParams(getTaskFilters());
+    params.set('page', Math.max(page || 1, 1));
+    params.set('page_size', TASK_PAGE_SIZE);
+
+    fetch('/api/tasks?' + params)
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                alert('加载任务失败：' + data.error);
+                return;
+            }
+            taskPage = data.page;
+            taskTotal = data.total;
+            const container = document.getElementById('task_container');
+            container.innerHTML = '';
+            if (!data.tasks.length) {
+                container.innerHTML = '<p>暂无监控任务</p>';
+            }
+            data.tasks.forEach(task => container.appendChild(renderTaskRow(task)));
+            updatePager();
+        })
+        .catch(error => {
+            console.error('Error:', error);
+        });
+}
+
+// 任务列表当前的筛选条件
+function getTaskFilters() {
+    const filters = {};
+    const mode = document.getElementById('filter_mode').value;
+    const status = document.getElementById('filter_status').value;
+    const host = document.getElementById('filter_host').value.trim();
+    const changedWithin = document.getElementById('filter_changed').value;
+    if (mode) filters.mode = mode;
+    if (status) filters.status = status;
+    if (host) filters.host = host;
+    if (changedWithin) filters.changed_since = Date.now() / 1000 - Number(changedWithin);
+    return filters;
+}
+
+// 对符合当前筛选条件的所有任务执行暂停、恢复或删除
+function bulkAction(action) {
+    const filters = getTaskFilters();
+    const names = {pause: '暂停', resume: '恢复', delete: '删除'};
+    const scope = Object.keys(filters).length ? '符合当前筛选条件的' : '全部';
+    if (!confirm(`确定要${names[action]}${scope}任务吗？`)) {
+        return;
+    }
+
+    fetch('/api/tasks/bulk', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({action: action, filter: filters, all: true})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            alert(`${names[action]}任务失败：` + data.error);
+        } else {
+            alert(data.message);
+            loadTasks(taskPage);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert(`${names[action]}任务失败，请检查网络连接！`);
+    });
+}
+
+function exportTasks(format) {
+    const params = new URLSearchParams(getTaskFilters());
+    params.set('format', format);
+    window.location = '/api/tasks/export?' + params;
+}
+
+// 导入 JSON lines 或 CSV 文件中的任务
+function importTasks() {
+    const file = document.getElementById('import_file').files[0];
+    if (!file) {
+        alert('请选择要导入的文件！');
+        return;
+    }
+    const form = new FormData();
+    form.append('file', file);
+
+    fetch('/api/tasks/import', {
+        method: 'POST',
+        body: form
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            const details = (data.errors || []).slice(0, 10).map(e => `第 ${e.line} 行：${e.error}`).join('\n');
+            alert('导入失败：' + data.error + (details ? '\n' + details : ''));
+        } else {
+            alert(data.message);
+            loadTasks(1);
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('导入失败，请检查网络连接！');
+    });
+}
+
+function updatePager() {
+    const pages = Math.max(Math.ceil(taskTotal / TASK_PAGE_SIZE), 1);
+    document.getElementById('page_info').textContent = `第 ${taskPage} / ${pages} 页，共 ${taskTotal} 个任务`;
+    document.getElementById('prev_page').disabled = taskPage <= 1;
+    document.getElementById('next_page').disabled = taskPage >= pages;
+}
+
+function formatTime(timestamp) {
+    return timestamp ? new Date(timestamp * 1000).toLocaleString() : '-';
+}
+
+// 生成一行任务，字段通过 data-field 就地更新
+function renderTaskRow(task) {
+    const row = document.createElement('div');
+    row.className = 'task-item';
+    row.dataset.taskId = task.id;
+    row.innerHTML = `
+        <div class="task-info">
+            <div>监控地址：<span data-field="url"></span></div>
+            <div>监控间隔：<span data-field="interval"></span>分钟</div>
+            <div>状态：<span data-field="status"></span></div>
+            <div>最近检查：<span data-field="last_checked"></span> <span data-field="last_result"></span></div>
+            <div>最近变化：<span data-field="last_changed"></span></div>
+        </div>
+        <div class="task-actions">
+            <button data-action="pause">暂停</button>
+            <button data-action="delete">删除</button>
+        </div>`;
+    row.querySelector('[data-action="pause"]').onclick = () => pauseTask(task.id);
+    row.querySelector('[data-action="delete"]').onclick = () => deleteTask(task.id);
+    setTaskFields(row, task);
+    return row;
+}
+
+function setTaskFields(row, task) {
+    const text = {
+        url: task.url,
+        interval: task.interval,
+        status: task.status,
+        last_checked: task.last_checked !== undefined ? formatTime(task.last_checked) : undefined,
+        last_result: task.last_result !== undefined ? `(${task.last_result || '-'})` : undefined,
+        last_changed: task.last_changed !== undefined ? formatTime(task.last_changed) : undefined
+    };
+    Object.entries(text).forEach(([field, value]) => {
+        if (value !== undefined) {
+            row.querySelector(`[data-field="${field}"]`).textContent = value;
+        }
+    });
+}
+
+function findTaskRow(taskId) {
+    return document.querySelector(`#task_container [data-task-id="${CSS.escape(taskId)}"]`);
+}
+
+// 只更新当前页中已显示的任务
+function updateTaskRow(task) {
+    const row = findTaskRow(task.id);
+    if (!row) {
+        return;
+    }
+    setTaskFields(row, task);
+    if (task.last_changed !== undefined && task.last_changed === task.last_checked) {
+        row.classList.add('changed');
+    }
+}
+
+function removeTaskRow(taskId) {
+    const row = findTaskRow(taskId);
+    if (row) {
+        row.remove();
+        taskTotal = Math.max(taskTotal - 1, 0);
+        updatePager();
+    }
+}
+
+// 订阅任务状态推送，断开后浏览器按服务端给出的 retry 间隔自动重连
+function subscribeTaskEvents() {
+    if (!window.EventSource) {
+        return;
+    }
+    const source = new EventSource('/api/events');
+    source.addEventListener('check', event => updateTaskRow(JSON.parse(event.data)));
+    source.addEventListener('status', event => updateTaskRow(JSON.parse(event.data)));
+    source.addEventListener('deleted', event => removeTaskRow(JSON.parse(event.data).id));
+    source.addEventListener('added', scheduleTaskReload);
+    source.addEventListener('bulk', scheduleTaskReload);
+}
+
+// 连续的新增、批量操作合并为一次刷新
+let reloadTimer = null;
+function scheduleTaskReload() {
+    clearTimeout(reloadTimer);
+    reloadTimer = setTimeout(() => loadTasks(taskPage), 1000);
+}
+
+// 按分隔符拆分输入并去掉空项
+function splitList(value, separator) {
+    return value.split(separator).map(item => item.trim()).filter(item => item);
+}
+
 // 暂停任务
 function pauseTask(taskId) {
     fetch(`/api/tasks/${taskId}/pause`, {
@@ -70,7 +289,7 @@ function pauseTask(taskId) {
             alert('暂停任务失败：' + data.error);
         } else {
             alert('任务已暂停');
-            location.reload();
+            updateTaskRow({id: taskId, status: 'paused'});
         }
     })
     .catch(error => {
@@ -94,7 +313,7 @@ function deleteTask(taskId) {
             alert('删除任务失败：' + data.error);
         } else {
             alert('任务已删除');
-            location.reload();
+            removeTaskRow(taskId);
         }
     })
     .catch(error => {
@@ -183,6 +402,9 @@ function saveEmailTemplate() {
 
 // 页面加载时加载设置
 document.addEventListener('DOMContentLoaded', function() {
+    loadTasks(1);
+    subscribeTaskEvents();
+
     // 加载AI设置
     fetch('/api/settings/ai')
         .then(response => response.json())
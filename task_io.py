@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+from urllib.parse import urlparse
+from monitor import MONITOR_TYPES
+
+# 导入导出使用与 POST /api/tasks 相同的字段名；列表字段在 CSV 中用分号分隔或写成 JSON 数组
+TASK_FIELDS = (
+    'mode', 'url', 'interval', 'status', 'compareMode', 'sendMail', 'emailAddresses', 'ccAddresses',
+    'adaptive', 'minInterval', 'maxInterval',
+    'includeSelectors', 'excludeSelectors', 'xpath', 'normalizers', 'parser'
+)
+LIST_FIELDS = ('emailAddresses', 'ccAddresses', 'includeSelectors', 'excludeSelectors', 'normalizers')
+BOOL_FIELDS = ('compareMode', 'sendMail', 'adaptive')
+# 任务记录中的字段名 -> 导出字段名
+TASK_KEYS = {
+    'compare_mode': 'compareMode',
+    'send_mail': 'sendMail',
+    'email_addresses': 'emailAddresses',
+    'cc_addresses': 'ccAddresses',
+    'min_interval': 'minInterval',
+    'max_interval': 'maxInterval',
+    'include_selectors': 'includeSelectors',
+    'exclude_selectors': 'excludeSelectors',
+}
+TASK_STATUSES = ('running', 'paused')
+
+
+def build_monitor(data):
+    """根据接口传入的任务字段创建监控实例，字段无效时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('任务必须是一个对象')
+    monitor_class = MONITOR_TYPES.get(data.get('mode')) if isinstance(data.get('mode'), str) else None
+    if not monitor_class:
+        raise ValueError('不支持的监控模式')
+    url = data.get('url') or ''
+    if not isinstance(url, str):
+        raise ValueError('监控地址必须是字符串')
+    url = url.strip()
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError(f'无效的监控地址: {url}')
+    try:
+        interval = int(float(data['interval']))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('无效的监控时间间隔')
+    if interval <= 0:
+        raise ValueError('监控时间间隔必须大于 0')
+
+    for key in ('emailAddresses', 'ccAddresses', 'includeSelectors', 'excludeSelectors'):
+        value = data.get(key) or []
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f'{key} 必须是字符串列表')
+    if data.get('xpath') and not isinstance(data['xpath'], str):
+        raise ValueError('xpath 必须是字符串')
+
+    options = {}
+    if data['mode'] == 'website':
+        # 网页区域选择和噪声过滤
+        options = {
+            'include_selectors': data.get('includeSelectors') or [],
+            'exclude_selectors': data.get('excludeSelectors') or [],
+            'xpath': data.get('xpath') or None,
+            'normalizers': data.get('normalizers') or [],
+            'parser': data.get('parser') or 'html.parser'
+        }
+
+    try:
+        min_interval = float(data['minInterval']) if data.get('minInterval') else None
+        max_interval = float(data['maxInterval']) if data.get('maxInterval') else None
+    except (TypeError, ValueError):
+        raise ValueError('无效的自适应间隔范围')
+
+    return monitor_class(
+        url=url,
+        interval=interval,
+        compare_mode=bool(data.get('compareMode')),
+        send_mail=bool(data.get('sendMail')),
+        email_addresses=data.get('emailAddresses') or [],
+        cc_addresses=data.get('ccAddresses') or [],
+        adaptive=bool(data.get('adaptive', False)),
+        min_interval=min_interval,
+        max_interval=max_interval,
+        **options
+    )
+
+
+def _parse_list(value):
+    value = value.strip()
+    if value.startswith('['):
+        return json.loads(value)
+    return [item.strip() for item in value.split(';') if item.strip()]
+
+
+def _parse_bool(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'y', '是')
+
+
+def _csv_records(text):
+    reader = csv.DictReader(io.StringIO(text))
+    for record in reader:
+        data = {}
+        try:
+            for key, value in record.items():
+                if key is None or value is None or not value.strip():
+                    continue
+                key = key.strip()
+                if key in LIST_FIELDS:
+                    data[key] = _parse_list(value)
+                elif key in BOOL_FIELDS:
+                    data[key] = _parse_bool(value)
+                else:
+                    data[key] = value.strip()
+        except ValueError as e:
+            data = ValueError(f'格式错误: {e}')
+        yield reader.line_num, data
+
+
+def _jsonl_records(text):
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        # 也接受整个 JSON 数组
+        for index, data in enumerate(json.loads(stripped), 1):
+            yield index, data
+        return
+    for line_num, line in enumerate(text.splitlines(), 1):
+        if line.strip():
+            try:
+                yield line_num, json.loads(line)
+            except ValueError as e:
+                yield line_num, ValueError(f'格式错误: {e}')
+
+
+def parse_tasks(text, fmt='jsonl'):
+    """解析导入内容，返回 ([(行号, 监控实例, 初始状态)], [{'line': 行号, 'error': 原因}])"""
+    records = _csv_records(text) if fmt == 'csv' else _jsonl_records(text)
+    tasks = []
+    errors = []
+    line_num = 0
+    while True:
+        try:
+            line_num, data = next(records)
+        except StopIteration:
+            break
+        except (ValueError, csv.Error) as e:
+            # 整个 JSON 数组或 CSV 结构错误时无法继续读取后续记录
+            errors.append({'line': line_num + 1, 'error': f'格式错误: {e}'})
+            break
+        try:
+            if isinstance(data, ValueError):
+                raise data
+            if not isinstance(data, dict):
+                raise ValueError('每条记录必须是一个对象')
+            status = data.get('status') or 'running'
+            if status not in TASK_STATUSES:
+                raise ValueError(f'无效的任务状态: {status}')
+            tasks.append((line_num, build_monitor(data), status))
+        except ValueError as e:
+            errors.append({'line': line_num, 'error': str(e)})
+        except Exception as e:
+            # 其他字段类型错误也只记为该行无效，不影响其余记录
+            errors.append({'line': line_num, 'error': f'无效的记录: {e}'})
+    return tasks, errors
+
+
+def task_to_record(task):
+    """把任务记录转换为导入格式的字段"""
+    record = {}
+    for key, value in task.items():
+        field = TASK_KEYS.get(key, key)
+        if field in TASK_FIELDS and value not in (None, [], ''):
+            record[field] = value
+    return record
+
+
+def export_jsonl(tasks):
+    for task in tasks:
+        yield json.dumps(task_to_record(task), ensure_ascii=False) + '\n'
+
+
+def export_csv(tasks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=TASK_FIELDS)
+    writer.writeheader()
+    for task in tasks:
+        record = task_to_record(task)
+        for field in LIST_FIELDS:
+            if field in record:
+                # 正则等值中可能含有分号，列表统一写成 JSON 数组
+                record[field] = json.dumps(record[field], ensure_ascii=False)
+        writer.writerow(record)
+        yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def _drain(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
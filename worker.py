@@ -0,0 +1,29 @@
+"""
+监控工作进程
+使用方法: python worker.py [--id 工作进程ID]
+
+与 app.py 共用 config/tasks.db（同一台机器或共享存储上的同一目录），
+按一致性哈希认领任务；需要在 config/cluster_settings.json 中设置 "enabled": true，
+app.py 才不会在自身进程中执行任务。
+"""
+import argparse
+import multiprocessing
+import os
+from cluster import run_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description='网站变化监控工作进程')
+    parser.add_argument('--id', help='工作进程 ID，默认使用 主机名-进程号')
+    parser.add_argument('--metrics-port', type=int,
+                        help='提供 /metrics 的端口，默认使用 cluster_settings.json 中的 metrics_port，0 表示不提供')
+    args = parser.parse_args()
+
+    os.makedirs('website_snapshots', exist_ok=True)
+    os.makedirs('config', exist_ok=True)
+    run_worker(args.id, args.metrics_port)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()